@@ -0,0 +1,81 @@
+"""Поля ответов API и их потоковая сериализация.
+
+Строки берутся через ``values()``: модели не создаются, а из базы
+читаются только запрошенные в ``fields=`` колонки (плюс ключ курсора).
+"""
+import json
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def _image_url(name):
+    return default_storage.url(name) if name else None
+
+
+# Имя поля в ответе -> (путь для values(), преобразование значения).
+POST_FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'pub_date': ('pub_date', None),
+    'author': ('author__username', None),
+    'group': ('group__slug', None),
+    'image': ('image', _image_url),
+    'image_width': ('image_width', None),
+    'image_height': ('image_height', None),
+    'image_placeholder': ('image_placeholder', None),
+    'comments_count': ('comments_count', None),
+}
+COMMENT_FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'created': ('created', None),
+    'author': ('author__username', None),
+}
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def select(available, requested):
+    """Поля ответа по параметру ``fields=``; по умолчанию - все."""
+    if not requested:
+        return list(available)
+    names = [name for name in requested.split(',') if name]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise FieldsError(
+            f'Неизвестные поля: {", ".join(unknown)}. '
+            f'Доступны: {", ".join(available)}.'
+        )
+    return list(dict.fromkeys(names))
+
+
+def paths(available, names, extra=()):
+    """Колонки для values(): выбранные поля и ключ курсора."""
+    return list(dict.fromkeys(
+        [available[name][0] for name in names] + list(extra)
+    ))
+
+
+def row(available, names, values):
+    result = {}
+    for name in names:
+        path, convert = available[name]
+        value = values[path]
+        result[name] = convert(value) if convert else value
+    return result
+
+
+def stream(items, next_cursor):
+    """Отдает ``{"results": [...], "next": ...}`` по кусочку на объект.
+
+    ``items`` - генератор словарей; ``next_cursor`` вызывается, когда он
+    исчерпан, поэтому курсор может зависеть от последней строки.
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    yield '{"results": ['
+    for index, item in enumerate(items):
+        yield (',' if index else '') + encoder.encode(item)
+    yield '], "next": ' + json.dumps(next_cursor()) + '}'
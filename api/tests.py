@@ -0,0 +1,91 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+
+def load(response):
+    return json.loads(b''.join(response.streaming_content))
+
+
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        for i in range(15):
+            Post.objects.create(text=f'Пост {i}', author=cls.author,
+                                group=cls.group if i % 2 else None)
+        cls.post = Post.objects.first()
+        for i in range(3):
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text=f'Комментарий {i}')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_cursor_walks_whole_feed(self):
+        """Курсор проходит ленту без повторов и пропусков."""
+        url, params, seen = reverse('api:index'), {'limit': 4}, []
+        while True:
+            data = load(self.client.get(url, params))
+            seen += [item['id'] for item in data['results']]
+            if data['next'] is None:
+                break
+            params['after'] = data['next']
+        self.assertEqual(
+            seen, list(Post.objects.values_list('id', flat=True))
+        )
+
+    def test_sparse_fields(self):
+        """В ответе только запрошенные поля, запрос читает только их."""
+        with CaptureQueriesContext(connection) as queries:
+            data = load(self.client.get(
+                reverse('api:profile', args=['author']),
+                {'fields': 'text,author', 'limit': 2}
+            ))
+        self.assertEqual(data['results'][0],
+                         {'text': 'Пост 14', 'author': 'author'})
+        self.assertNotIn('image_placeholder',
+                         queries.captured_queries[-1]['sql'])
+
+    def test_group_comments_and_follow(self):
+        """Лента группы, комментарии по порядку и лента подписок."""
+        data = load(self.client.get(reverse('api:group', args=['group']),
+                                    {'limit': 100}))
+        self.assertEqual(len(data['results']), 7)
+
+        data = load(self.client.get(
+            reverse('api:comments', args=[self.post.pk]), {'fields': 'text'}
+        ))
+        self.assertEqual([item['text'] for item in data['results']],
+                         ['Комментарий 0', 'Комментарий 1', 'Комментарий 2'])
+
+        self.client.force_login(self.reader)
+        data = load(self.client.get(reverse('api:follow_index'),
+                                    {'fields': 'id'}))
+        self.assertEqual(len(data['results']), 10)
+        self.assertIsNotNone(data['next'])
+
+    def test_errors(self):
+        """Ошибки запроса приходят JSON с нужным кодом."""
+        cases = (
+            (reverse('api:index'), {'fields': 'password'}, 400),
+            (reverse('api:index'), {'after': '!!!'}, 400),
+            (reverse('api:index'), {'limit': 1000}, 400),
+            (reverse('api:group', args=['missing']), {}, 404),
+            (reverse('api:follow_index'), {}, 401),
+        )
+        for url, params, status in cases:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
@@ -0,0 +1,147 @@
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from posts import queries
+from posts.models import Comment, Group, Post, TimelineEntry
+from posts.pagination import (CURSOR_PARAM, PER_PAGE, CursorPaginator,
+                              decode_cursor)
+
+from . import serializers
+
+User = get_user_model()
+
+MAX_LIMIT = 100
+
+
+class BadRequest(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def api_view(view):
+    """GET-only, ошибки запроса - JSON с кодом вместо HTML-страницы."""
+    @require_GET
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except (BadRequest, serializers.FieldsError) as error:
+            return _error(str(error), getattr(error, 'status', 400))
+    wrapper.__name__ = view.__name__
+    wrapper.__doc__ = view.__doc__
+    return wrapper
+
+
+def _params(request, available):
+    names = serializers.select(available, request.GET.get('fields'))
+    try:
+        limit = int(request.GET.get('limit', PER_PAGE))
+    except ValueError:
+        raise BadRequest('limit должен быть числом.')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise BadRequest(f'limit должен быть от 1 до {MAX_LIMIT}.')
+    token = request.GET.get(CURSOR_PARAM)
+    cursor = decode_cursor(token) if token else None
+    if token and cursor is None:
+        raise BadRequest('Испорченный курсор.')
+    return names, limit, cursor
+
+
+def _response(chunks):
+    return StreamingHttpResponse(chunks, content_type='application/json')
+
+
+def _feed(request, queryset, available, ordering):
+    """Страница ленты по курсору: строки идут в ответ по мере чтения."""
+    names, limit, cursor = _params(request, available)
+    paginator = CursorPaginator(queryset, limit, ordering)
+    columns = serializers.paths(
+        available, names, (paginator.value_field, paginator.id_field)
+    )
+    rows = paginator.after(cursor).values(*columns)[:limit + 1]
+    state = {'last': None, 'more': False}
+
+    def items():
+        for index, values in enumerate(rows.iterator()):
+            if index == limit:
+                state['more'] = True
+                return
+            state['last'] = values
+            yield serializers.row(available, names, values)
+
+    def next_cursor():
+        if not state['more']:
+            return None
+        return paginator.cursor_for(state['last'])
+
+    return _response(serializers.stream(items(), next_cursor))
+
+
+def _get_id(queryset, **lookup):
+    pk = queryset.filter(**lookup).values_list('pk', flat=True).first()
+    if pk is None:
+        raise BadRequest('Не найдено.', status=404)
+    return pk
+
+
+@api_view
+def index(request):
+    return _feed(request, Post.objects.all(), serializers.POST_FIELDS,
+                 queries.POST_ORDERING)
+
+
+@api_view
+def group_posts(request, slug):
+    group_id = _get_id(Group.objects, slug=slug)
+    return _feed(request, Post.objects.filter(group_id=group_id),
+                 serializers.POST_FIELDS, queries.POST_ORDERING)
+
+
+@api_view
+def profile(request, username):
+    author_id = _get_id(User.objects, username=username)
+    return _feed(request, Post.objects.filter(author_id=author_id),
+                 serializers.POST_FIELDS, queries.POST_ORDERING)
+
+
+@api_view
+def comments(request, post_id):
+    _get_id(Post.objects, pk=post_id)
+    return _feed(request, Comment.objects.filter(post_id=post_id),
+                 serializers.COMMENT_FIELDS, queries.COMMENT_ORDERING)
+
+
+@api_view
+def follow_index(request):
+    """Лента подписок: страница записей ленты, затем посты одним IN."""
+    if not request.user.is_authenticated:
+        raise BadRequest('Нужна авторизация.', status=401)
+    available = serializers.POST_FIELDS
+    names, limit, cursor = _params(request, available)
+    paginator = CursorPaginator(
+        TimelineEntry.objects.filter(user=request.user), limit,
+        queries.TIMELINE_ORDERING
+    )
+    entries = list(
+        paginator.after(cursor).values('post_id', 'pub_date')[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+    posts = {
+        values['id']: values
+        for values in Post.objects.filter(
+            pk__in=[entry['post_id'] for entry in entries]
+        ).values(*serializers.paths(available, names, ('id',)))
+    }
+    items = (
+        serializers.row(available, names, posts[entry['post_id']])
+        for entry in entries if entry['post_id'] in posts
+    )
+    next_cursor = paginator.cursor_for(entries[-1]) if more else None
+    return _response(serializers.stream(items, lambda: next_cursor))
@@ -1,34 +1,223 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin import helpers
+from django.contrib.auth import get_user_model
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.template.response import TemplateResponse
+from django.utils.functional import cached_property
 
-from .models import Comment, Follow, Group, Post
+from . import moderation, search
+from .models import Comment, Follow, Group, ModerationJob, Post
 
+User = get_user_model()
 
-class PostAdmin(admin.ModelAdmin):
+# Меньше этого COUNT(*) дешев, и список показывает точное число.
+ESTIMATE_THRESHOLD = 10000
+
+
+def estimated_count(model):
+    """Примерное число строк таблицы без прохода по ней; None, если нечем.
+
+    В PostgreSQL это статистика планировщика, в SQLite - наибольший
+    первичный ключ (удаленные строки оно тоже считает).
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class '
+                           'WHERE relname = %s', [model._meta.db_table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'SELECT MAX(rowid) FROM {table}')
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Без фильтров берет оценку числа строк вместо COUNT(*) всей таблицы."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Список не считает таблицу целиком и не строит выпадающих списков FK."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+
+
+class UsernameSearchAdmin(ScalableAdmin):
+    """Поиск по точному имени пользователя: идет по индексам.
+
+    Стандартный поиск - это LIKE '%...%' или iexact, оба читают таблицу
+    целиком. Здесь id пользователя находит уникальный индекс username, а
+    строки - индексы внешних ключей из ``username_fields``.
+    """
+    username_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        users = User.objects.filter(username=search_term).values('pk')
+        condition = Q()
+        for field in self.username_fields:
+            condition |= Q(**{f'{field}_id__in': users})
+        return queryset.filter(condition), False
+
+
+class GroupChoiceForm(forms.Form):
+    group = forms.ModelChoiceField(Group.objects.all(), required=False,
+                                   label='Группа',
+                                   empty_label='Без группы')
+
+
+def _confirm(modeladmin, request, queryset, action, summary, form=None,
+             authors=()):
+    """Страница подтверждения; выбор строк передается обратно как есть.
+
+    При «выбрать все» назад уходит только флаг select_across: queryset
+    заново строится из фильтров в адресе, а не из тысяч id в форме.
+    """
+    select_across = request.POST.get('select_across', '0')
+    context = {
+        **modeladmin.admin_site.each_context(request),
+        'title': dict(ModerationJob.ACTIONS)[action],
+        'summary': summary,
+        'form': form,
+        'authors': authors,
+        'opts': modeladmin.model._meta,
+        'action': request.POST['action'],
+        'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        'select_across': select_across,
+        'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+        'media': modeladmin.media,
+    }
+    return TemplateResponse(request, 'admin/posts/moderation_confirm.html',
+                            context)
+
+
+def _queue_author_jobs(modeladmin, request, queryset, action, noun):
+    author_ids = queryset.order_by().values_list('author', flat=True)
+    authors = list(User.objects.filter(pk__in=author_ids.distinct()))
+    if request.POST.get('apply') != 'yes':
+        return _confirm(
+            modeladmin, request, queryset, action,
+            f'Удалить все {noun} этих авторов ({len(authors)}), '
+            f'а не только выбранные?', authors=authors,
+        )
+    for author in authors:
+        moderation.create(action, request.user, author=author)
+    modeladmin.message_user(
+        request, f'Заданий на удаление поставлено: {len(authors)}.'
+    )
+    return None
+
+
+class PostAdmin(ScalableAdmin):
     list_display = ('text', 'pub_date', 'author', 'group', 'image')
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('author',)
+    autocomplete_fields = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
-    empty_value_display = '-пусто-'
+    actions = ('reassign_group', 'delete_authors_posts')
+
+    def reassign_group(self, request, queryset):
+        form = GroupChoiceForm(request.POST if 'apply' in request.POST
+                               else None)
+        if not form.is_valid():
+            return _confirm(
+                self, request, queryset, ModerationJob.REASSIGN_GROUP,
+                f'Перенести выбранные посты ({queryset.count()}) в группу:',
+                form=form,
+            )
+        post_ids = queryset.order_by('pk').values_list('pk', flat=True)
+        job = moderation.create(
+            ModerationJob.REASSIGN_GROUP, request.user,
+            group=form.cleaned_data['group'], post_ids=post_ids.iterator(),
+        )
+        self.message_user(request, f'Постов к переносу: {job.total}.')
+        return None
+    reassign_group.short_description = 'Перенести в группу (в фоне)'
+
+    def delete_authors_posts(self, request, queryset):
+        return _queue_author_jobs(self, request, queryset,
+                                  ModerationJob.DELETE_POSTS, 'посты')
+    delete_authors_posts.short_description = (
+        'Удалить все посты их авторов (в фоне)'
+    )
+
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%...%' по всей таблице ищем по индексу FTS5.
+        if not search_term or not search.available():
+            return super().get_search_results(request, queryset, search_term)
+        return search.filter_queryset(queryset, search_term), False
 
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description')
     search_fields = ('title',)
-    list_filter = ('title',)
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(UsernameSearchAdmin):
     list_display = ("pk", "text", "created", "author")
-    search_fields = ('text',)
-    empty_value_display = "-пусто-"
+    list_select_related = ('author',)
+    raw_id_fields = ('post', 'author')
+    search_fields = ('author__username',)
+    username_fields = ('author',)
+    actions = ('delete_authors_comments',)
 
+    def delete_authors_comments(self, request, queryset):
+        return _queue_author_jobs(self, request, queryset,
+                                  ModerationJob.DELETE_COMMENTS,
+                                  'комментарии')
+    delete_authors_comments.short_description = (
+        'Удалить все комментарии их авторов (в фоне)'
+    )
 
-class FollowAdmin(admin.ModelAdmin):
+
+class FollowAdmin(UsernameSearchAdmin):
     list_display = ("pk", "user", "author")
-    empty_value_display = "-пусто-"
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    username_fields = ('user', 'author')
+
+
+class ModerationJobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'action', 'status', 'progress', 'author', 'group',
+                    'created_by', 'created', 'finished')
+    list_select_related = ('author', 'group', 'created_by')
+    list_filter = ('status', 'action')
+    exclude = ('post_ids',)
+    readonly_fields = ('action', 'status', 'author', 'group', 'total',
+                       'processed', 'error', 'created_by', 'started',
+                       'finished')
+    empty_value_display = '-пусто-'
+
+    def progress(self, job):
+        return f'{job.processed} / {job.total}'
+    progress.short_description = 'Прогресс'
+
+    def has_add_permission(self, request):
+        # Задания создают действия в списках постов и комментариев.
+        return False
 
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(ModerationJob, ModerationJobAdmin)
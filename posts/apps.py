@@ -1,5 +1,21 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def install_search(sender, using, **kwargs):
+    from django.db import connections
+
+    from . import search
+
+    connection = connections[using]
+    if 'posts_post' in connection.introspection.table_names():
+        # Пересборка posts_post в миграциях на SQLite теряет триггеры.
+        search.install(connection)
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import signals  # noqa
+        post_migrate.connect(install_search, sender=self)
@@ -0,0 +1,46 @@
+"""Помощники для массовой загрузки данных мимо сигналов.
+
+``bulk_create`` не шлет post_save, поэтому после загрузки ленты
+подписок и счетчики надо пересобрать (``finish``).
+"""
+from contextlib import contextmanager
+from itertools import islice
+
+from django.db import transaction
+
+from . import caching, counters, timeline
+
+BATCH_SIZE = 1000
+
+
+def batched(iterable, size=BATCH_SIZE):
+    """Режет поток на списки не длиннее ``size``."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def explicit_dates(model, *names):
+    """Отключает auto_now/auto_now_add у полей: даты задаем сами."""
+    fields = [model._meta.get_field(name) for name in names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def finish(batch_size=BATCH_SIZE):
+    """То, что при обычной записи делают сигналы: ленты, счетчики, кеш."""
+    with transaction.atomic():
+        follows = timeline.rebuild()
+    fixed = counters.reconcile(batch_size)
+    caching.bump_feed_version()
+    return follows, fixed
@@ -0,0 +1,57 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+FEED_VERSION_KEY = 'feed:version'
+SESSION_VERSION_KEY = 'feed_version'
+
+
+def _initial_version():
+    # Счетчик мог вытесниться из кеша: продолжаем с метки времени, чтобы не
+    # попасть на фрагменты, сохраненные под старыми номерами.
+    return int(time.time() * 1000)
+
+
+def feed_version():
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        cache.add(FEED_VERSION_KEY, _initial_version(), None)
+        version = cache.get(FEED_VERSION_KEY, _initial_version())
+    return version
+
+
+def bump_feed_version():
+    """Инвалидирует все закешированные страницы ленты разом."""
+    try:
+        return cache.incr(FEED_VERSION_KEY)
+    except ValueError:
+        pass
+    feed_version()
+    try:
+        return cache.incr(FEED_VERSION_KEY)
+    except ValueError:
+        # Кеш, который ничего не хранит (DummyCache): инвалидировать нечего.
+        return None
+
+
+def remember_write(request):
+    """Запоминает в сессии версию ленты, в которую попала запись автора.
+
+    Если кеш у воркеров свой, чужой воркер может еще не знать о новой
+    версии; автор все равно увидит свой пост (read-your-writes).
+    """
+    request.session[SESSION_VERSION_KEY] = feed_version()
+
+
+def feed_cache_context(request, page):
+    """Переменные для {% cache %} ленты: таймаут, версия и ключ страницы."""
+    version = max(
+        feed_version(), request.session.get(SESSION_VERSION_KEY, 0)
+    )
+    page_key = getattr(page, 'cursor', None) or getattr(page, 'number', 1)
+    return {
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'feed_version': version,
+        'page_key': page_key,
+    }
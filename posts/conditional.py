@@ -0,0 +1,119 @@
+"""ETag для условных GET-запросов к лентам, профилю и посту.
+
+Каждая функция обходится парой индексных чтений и вызывается декоратором
+``condition`` до пагинации и рендера шаблона: если ETag совпал с
+If-None-Match, клиент сразу получает 304. Last-Modified не отдаем:
+страница зависит от того, кто смотрит, а дата этого не учитывает.
+"""
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.db.models import Max
+
+from . import caching, counters
+from .models import Follow, Post
+
+User = get_user_model()
+
+
+def _etag(*parts):
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def _viewer(request):
+    return request.user.pk or 0
+
+
+def latest_update(request=None):
+    """Время последней правки или комментария среди всех постов.
+
+    Идет по индексу на ``updated``. Удаления поста дата не ловит, их
+    отражает версия ленты из кеша. С ``request`` значение запоминается
+    на запрос: его берут и ETag, и ключ кеша страницы.
+    """
+    if request is not None and hasattr(request, '_latest_update'):
+        return request._latest_update
+    stamp = Post.objects.aggregate(stamp=Max('updated'))['stamp']
+    stamp = stamp.timestamp() if stamp else 0
+    if request is not None:
+        request._latest_update = stamp
+    return stamp
+
+
+def page_author(request, username):
+    """Автор страницы и его счетчики, запомненные на запрос.
+
+    Их читает и ETag, и сама страница профиля или поста. Если автора нет,
+    возвращает ``(None, None)``.
+    """
+    if not hasattr(request, '_page_author'):
+        author = User.objects.filter(username=username).first()
+        # Строку счетчиков создает и сама страница, так ETag не меняется
+        # между первым и вторым запросом.
+        stats = counters.for_user(author) if author is not None else None
+        request._page_author = author, stats
+    return request._page_author
+
+
+def is_following(request, author):
+    """Подписан ли зритель на автора; запоминается на запрос."""
+    if not hasattr(request, '_following'):
+        request._following = (
+            request.user.is_authenticated and author is not None
+            and Follow.objects.filter(user=request.user,
+                                      author=author).exists()
+        )
+    return request._following
+
+
+def _stats_state(stats):
+    if stats is None:
+        return None
+    return stats.posts_count, stats.followers_count, stats.following_count
+
+
+def index_etag(request):
+    return _etag('index', _viewer(request), latest_update(request),
+                 caching.feed_version())
+
+
+def group_etag(request, slug):
+    return _etag('group', slug, _viewer(request), latest_update(request),
+                 caching.feed_version())
+
+
+def _viewer_following(request):
+    # Блок рекомендаций прячет авторов, на которых зритель уже подписан.
+    if not request.user.is_authenticated:
+        return None
+    return counters.for_user(request.user).following_count
+
+
+def profile_etag(request, username):
+    author, stats = page_author(request, username)
+    return _etag('profile', username, _viewer(request), latest_update(request),
+                 caching.feed_version(), _stats_state(stats),
+                 is_following(request, author), _viewer_following(request))
+
+
+def _post_updated(username, post_id):
+    # Без сортировки: строка одна, а ORDER BY с JOIN SQLite сортирует
+    # во временном B-дереве.
+    updated = Post.objects.filter(
+        pk=post_id, author__username=username
+    ).order_by().values_list('updated', flat=True)[:1]
+    return updated[0].timestamp() if updated else None
+
+
+def post_etag(request, username, post_id):
+    # Кнопки подписки на странице поста нет, поэтому подписка в ETag
+    # не входит.
+    _, stats = page_author(request, username)
+    return _etag('post', post_id, _viewer(request),
+                 _post_updated(username, post_id), _stats_state(stats))
+
+
+def comments_etag(request, username, post_id):
+    # Порция комментариев одинакова для всех зрителей, а новый
+    # комментарий сдвигает updated поста.
+    return _etag('comments', post_id, _post_updated(username, post_id))
@@ -0,0 +1,132 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+def _shift(queryset, field, delta, **extra):
+    """Атомарно сдвигает счетчик; возвращает число задетых строк."""
+    if delta < 0:
+        # Не уходим ниже нуля, даже если счетчик уже разошелся с данными.
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta}, **extra)
+
+
+def change_user(user_id, field, delta):
+    stats = UserStats.objects.filter(user_id=user_id)
+    if _shift(stats, field, delta) or delta < 0:
+        # Уменьшение без строки не создает ее: пользователь может
+        # удаляться каскадом прямо сейчас.
+        return
+    if not stats.exists():
+        # Строки еще нет: считаем по данным, новое событие уже в базе.
+        recount_users([user_id])
+
+
+def change_comments(post_id, delta):
+    # Вместе со счетчиком сдвигаем updated: это версия кеша карточки.
+    _shift(Post.objects.filter(pk=post_id), 'comments_count', delta,
+           updated=timezone.now())
+
+
+def for_user(user):
+    """Счетчики пользователя; при первом обращении строка создается."""
+    stats = UserStats.objects.filter(user=user).first()
+    if stats is None:
+        recount_users([user.pk])
+        stats = UserStats.objects.get(user=user)
+    return stats
+
+
+def _grouped_counts(queryset, field, ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': ids})
+        .values_list(field)
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+
+
+def recount_users(user_ids):
+    """Пересчитывает счетчики пачки пользователей; возвращает число правок."""
+    posts = _grouped_counts(Post.objects, 'author_id', user_ids)
+    followers = _grouped_counts(Follow.objects, 'author_id', user_ids)
+    following = _grouped_counts(Follow.objects, 'user_id', user_ids)
+    existing = UserStats.objects.in_bulk(user_ids)
+
+    drifted, missing = [], []
+    for user_id in user_ids:
+        actual = {
+            'posts_count': posts.get(user_id, 0),
+            'followers_count': followers.get(user_id, 0),
+            'following_count': following.get(user_id, 0),
+        }
+        stats = existing.get(user_id)
+        if stats is None:
+            missing.append(UserStats(user_id=user_id, **actual))
+        elif any(getattr(stats, name) != value
+                 for name, value in actual.items()):
+            for name, value in actual.items():
+                setattr(stats, name, value)
+            drifted.append(stats)
+
+    with transaction.atomic():
+        UserStats.objects.bulk_update(
+            drifted, ['posts_count', 'followers_count', 'following_count']
+        )
+        try:
+            with transaction.atomic():
+                UserStats.objects.bulk_create(missing)
+        except IntegrityError:
+            # Строку параллельно создал другой запрос: она уже верна.
+            pass
+    return len(drifted) + len(missing)
+
+
+def recount_posts(post_ids):
+    """Пересчитывает comments_count пачки постов; возвращает число правок."""
+    comments = _grouped_counts(Comment.objects, 'post_id', post_ids)
+    drifted = []
+    now = timezone.now()
+    for post in Post.objects.filter(pk__in=post_ids).only('comments_count'):
+        actual = comments.get(post.pk, 0)
+        if post.comments_count != actual:
+            post.comments_count = actual
+            post.updated = now
+            drifted.append(post)
+    Post.objects.bulk_update(drifted, ['comments_count', 'updated'])
+    return len(drifted)
+
+
+def _id_batches(queryset, batch_size):
+    # Пачки по ключу, а не открытый курсор: между пачками идет запись.
+    last = 0
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=last)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def reconcile(batch_size=BATCH_SIZE):
+    """Проходит всех пользователей и посты пачками, чиня расхождения."""
+    fixed_users = sum(
+        recount_users(batch)
+        for batch in _id_batches(User.objects.all(), batch_size)
+    )
+    fixed_posts = sum(
+        recount_posts(batch)
+        for batch in _id_batches(Post.objects.all(), batch_size)
+    )
+    return fixed_users, fixed_posts
@@ -0,0 +1,173 @@
+"""Выгрузка постов и комментариев пользователя потоком.
+
+Строки читаются через ``values_list().iterator()`` кусками по
+``CHUNK_SIZE`` и сразу уходят в ответ или файл: память не зависит от
+того, сколько всего написал пользователь. Поля постов совпадают с тем,
+что читает команда ``import_content``, а в архиве картинки лежат по тем
+же путям, что и в поле ``image``.
+"""
+import csv
+import logging
+import zipfile
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Comment, Post
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2000
+# Архив копится в памяти до такого размера и уходит клиенту куском.
+FLUSH_SIZE = 64 * 1024
+
+FORMATS = ('jsonl', 'csv', 'zip')
+KINDS = ('posts', 'comments')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'zip': 'application/zip',
+}
+
+# Имя поля в выгрузке -> колонка для values_list().
+POST_FIELDS = {
+    'id': 'id',
+    'author': 'author__username',
+    'text': 'text',
+    'group': 'group__slug',
+    'pub_date': 'pub_date',
+    'image': 'image',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+
+
+def _rows(queryset, fields):
+    names = list(fields)
+    for values in (queryset.order_by('pk').values_list(*fields.values())
+                   .iterator(chunk_size=CHUNK_SIZE)):
+        yield dict(zip(names, values))
+
+
+def rows(user, kind):
+    """Словари постов или комментариев пользователя в порядке id."""
+    if kind == 'posts':
+        return _rows(Post.objects.filter(author=user), POST_FIELDS)
+    return _rows(Comment.objects.filter(author=user), COMMENT_FIELDS)
+
+
+def fields(kind):
+    return list(POST_FIELDS if kind == 'posts' else COMMENT_FIELDS)
+
+
+def jsonl(items):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for item in items:
+        yield encoder.encode(item) + '\n'
+
+
+class _Echo:
+    """Файл для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(items, names):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(names)
+    for item in items:
+        yield writer.writerow([
+            item[name].isoformat() if hasattr(item[name], 'isoformat')
+            else item[name]
+            for name in names
+        ])
+
+
+class _Sink:
+    """Поток только на запись: zipfile пишет сюда, генератор забирает.
+
+    Без seek и tell zipfile сам пишет размеры после данных каждого файла.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self, force=False):
+        if not self.buffer or (len(self.buffer) < FLUSH_SIZE and not force):
+            return None
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def images(user):
+    return (
+        Post.objects.filter(author=user).exclude(image='').exclude(image=None)
+        .order_by().values_list('image', flat=True).distinct()
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def archive(user):
+    """Zip с posts.jsonl, comments.jsonl и картинками постов."""
+    sink = _Sink()
+    date_time = timezone.now().timetuple()[:6]
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zip_:
+        for kind in KINDS:
+            info = zipfile.ZipInfo(f'{kind}.jsonl', date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with zip_.open(info, 'w', force_zip64=True) as entry:
+                for line in jsonl(rows(user, kind)):
+                    entry.write(line.encode())
+                    data = sink.drain()
+                    if data:
+                        yield data
+        for name in images(user):
+            # Картинки уже сжаты: кладем как есть.
+            info = zipfile.ZipInfo(name, date_time)
+            try:
+                source = default_storage.open(name)
+            except OSError:
+                logger.warning('Картинки %s нет в хранилище', name)
+                continue
+            with source, zip_.open(info, 'w', force_zip64=True) as entry:
+                for block in source.chunks():
+                    entry.write(block)
+                    data = sink.drain()
+                    if data:
+                        yield data
+    data = sink.drain(force=True)
+    if data:
+        yield data
+
+
+def chunks(user, data_format, kind='posts'):
+    """Байты выгрузки; для jsonl и csv - только посты или комментарии."""
+    if data_format == 'zip':
+        return archive(user)
+    items = rows(user, kind)
+    if data_format == 'csv':
+        lines = csv_lines(items, fields(kind))
+    else:
+        lines = jsonl(items)
+    return (line.encode() for line in lines)
+
+
+def filename(user, data_format, kind='posts'):
+    if data_format == 'zip':
+        return f'{user.username}.zip'
+    return f'{user.username}-{kind}.{data_format}'
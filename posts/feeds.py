@@ -0,0 +1,149 @@
+"""Atom-ленты сайта, групп и авторов для агрегаторов.
+
+Состояние ленты - пары (id, updated) ее первых ``FEED_SIZE`` постов,
+выбранные тем же индексом, что и сама лента. По нему считаются ETag и
+Last-Modified: опрос без изменений получает 304, не доходя до рендера,
+а готовый XML лежит в кеше под ключом из того же ETag.
+"""
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET
+
+from . import queries
+from .models import Group
+
+User = get_user_model()
+
+FEED_SIZE = 20
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class PostsFeed(Feed):
+    feed_type = Atom1Feed
+    title = 'Yatube: последние записи'
+    subtitle = 'Новые записи всех авторов'
+
+    def link(self, obj):
+        return reverse('index')
+
+    def posts(self, obj):
+        return queries.index_feed()
+
+    def items(self, obj):
+        return self.posts(obj)[:FEED_SIZE]
+
+    def version(self, obj):
+        """Данные шапки ленты, которые тоже входят в ETag."""
+        return None
+
+    def item_title(self, item):
+        return str(item)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('post', args=[item.author.username, item.pk])
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_updateddate(self, item):
+        return item.updated
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def subtitle(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('group', args=[obj.slug])
+
+    def posts(self, obj):
+        return queries.group_feed(obj)
+
+    def version(self, obj):
+        return obj.title, obj.description
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'Yatube: @{obj.username}'
+
+    def subtitle(self, obj):
+        return f'Записи {obj.get_full_name() or obj.username}'
+
+    def link(self, obj):
+        return reverse('profile', args=[obj.username])
+
+    def posts(self, obj):
+        return queries.profile_feed(obj)
+
+    def version(self, obj):
+        return obj.get_full_name()
+
+
+def cached_feed(feed_class):
+    """View ленты с условным GET и кешем XML по ETag."""
+    feed = feed_class()
+
+    @require_GET
+    def view(request, **kwargs):
+        obj = feed.get_object(request, **kwargs)
+        state = list(
+            feed.posts(obj).order_by(*queries.POST_ORDERING)
+            .values_list('id', 'updated')[:FEED_SIZE]
+        )
+        # Ссылки в ленте абсолютные, поэтому хост тоже часть версии.
+        etag = hashlib.md5(repr((
+            feed_class.__name__, request.get_host(), kwargs,
+            feed.version(obj), state
+        )).encode()).hexdigest()
+        # В заголовке даты с точностью до секунды.
+        last_modified = max(
+            (int(updated.timestamp()) for _, updated in state),
+            default=None
+        )
+        response = get_conditional_response(
+            request, etag=quote_etag(etag), last_modified=last_modified
+        )
+        if response is None:
+            key = f'atom:{etag}'
+            cached = cache.get(key)
+            if cached is None:
+                rendered = feed(request, **kwargs)
+                cached = (rendered.content, rendered['Content-Type'])
+                cache.set(key, cached, FEED_CACHE_TIMEOUT)
+            response = HttpResponse(cached[0], content_type=cached[1])
+        response['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    return view
+
+
+index_feed = cached_feed(PostsFeed)
+group_feed = cached_feed(GroupFeed)
+author_feed = cached_feed(AuthorFeed)
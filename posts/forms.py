@@ -1,5 +1,7 @@
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
+from .images import describe, strip_metadata
 from .models import Comment, Post
 
 
@@ -14,6 +16,18 @@ class PostForm(ModelForm):
         help_texts = {'text': 'Заполнить', 
                       'group': 'Выбрать группу'}
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            # EXIF с геометками и моделью камеры не должен попасть в media.
+            image = strip_metadata(image)
+        if 'image' in self.changed_data:
+            # Поля не из формы: construct_instance их не тронет, а
+            # post_edit сохраняет пост без form.save().
+            for name, value in describe(image).items():
+                setattr(self.instance, name, value)
+        return image
+
 class CommentForm(ModelForm):
     class Meta:
         model = Comment
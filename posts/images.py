@@ -0,0 +1,152 @@
+"""Обработка картинок постов: очистка загрузки и варианты для srcset.
+
+Загрузка пересохраняется без EXIF и прочих метаданных (с поворотом по
+ориентации из EXIF), варианты режутся под пропорции карточки 960x339 и
+сохраняются в WebP и JPEG. Выбор формата отдаем браузеру через
+``<picture>``: карточка кешируется одна на всех, без Vary: Accept.
+"""
+import base64
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .models import ImageVariant
+
+CARD_SIZE = (960, 339)
+WIDTHS = (320, 640, 960)
+# Порядок важен: в <picture> первым идет более легкий формат.
+FORMATS = (
+    ('webp', 'WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', 'image/jpeg', {'quality': 82, 'optimize': True,
+                                    'progressive': True}),
+)
+# Форматы, которые пересохраняем без потерь смысла; GIF может быть
+# анимированным, а метаданных, о которых стоит беспокоиться, в нем нет.
+CLEAN_FORMATS = {'JPEG', 'PNG', 'WEBP', 'TIFF'}
+# Превью размером с ноготь: сотни байт в data: URI, растягивается
+# и размывается браузером, пока грузится сама картинка.
+PLACEHOLDER_WIDTH = 16
+METADATA_FIELDS = ('image_width', 'image_height', 'image_size',
+                   'image_placeholder')
+
+
+def _open(file_):
+    file_.seek(0)
+    image = Image.open(file_)
+    return ImageOps.exif_transpose(image)
+
+
+def strip_metadata(upload):
+    """Пересохраняет загрузку без метаданных; прочее возвращает как есть."""
+    upload.seek(0)
+    source = Image.open(upload)
+    if source.format not in CLEAN_FORMATS:
+        upload.seek(0)
+        return upload
+    image_format = source.format
+    image = ImageOps.exif_transpose(source)
+    buffer = io.BytesIO()
+    options = {'quality': 95} if image_format == 'JPEG' else {}
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    # Без exif=/pnginfo= PIL ничего из исходных метаданных не пишет.
+    image.save(buffer, image_format, **options)
+    return ContentFile(buffer.getvalue(), name=upload.name)
+
+
+def placeholder(image):
+    """Крошечный JPEG в пропорциях карточки как data: URI."""
+    height = max(1, round(PLACEHOLDER_WIDTH * CARD_SIZE[1] / CARD_SIZE[0]))
+    tiny = ImageOps.fit(image, (PLACEHOLDER_WIDTH, height), Image.BILINEAR)
+    buffer = io.BytesIO()
+    tiny.convert('RGB').save(buffer, 'JPEG', quality=40)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{encoded}'
+
+
+def describe(file_):
+    """Значения полей ``METADATA_FIELDS`` для файла картинки."""
+    if not file_:
+        return {**dict.fromkeys(METADATA_FIELDS[:-1]),
+                'image_placeholder': ''}
+    image = _open(file_)
+    image.load()
+    file_.seek(0)
+    return {
+        'image_width': image.width,
+        'image_height': image.height,
+        'image_size': file_.size,
+        'image_placeholder': placeholder(image),
+    }
+
+
+def _render(image, width, image_format, options):
+    height = round(width * CARD_SIZE[1] / CARD_SIZE[0])
+    resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+    if resized.mode not in ('RGB', 'RGBA') or image_format == 'JPEG':
+        resized = resized.convert('RGB')
+    buffer = io.BytesIO()
+    resized.save(buffer, image_format, **options)
+    return height, buffer.getvalue()
+
+
+def build_variants(post):
+    """Строит все варианты картинки поста, заменяя прежние."""
+    old = list(post.image_variants.all())
+    variants = []
+    if post.image:
+        with post.image.open('rb') as file_:
+            image = _open(file_)
+            image.load()
+        base = os.path.splitext(os.path.basename(post.image.name))[0]
+        for width in WIDTHS:
+            for name, image_format, _, options in FORMATS:
+                height, content = _render(image, width, image_format,
+                                          options)
+                variant = ImageVariant(post=post, format=name,
+                                       width=width, height=height)
+                variant.file.save(f'{base}-{width}.{name}',
+                                  ContentFile(content), save=False)
+                variants.append(variant)
+    with transaction.atomic():
+        ImageVariant.objects.filter(pk__in=[v.pk for v in old]).delete()
+        ImageVariant.objects.bulk_create(variants)
+    for variant in old:
+        variant.file.delete(save=False)
+    return len(variants)
+
+
+def delete_variants(post):
+    """Удаляет варианты картинки поста: строки сразу, файлы после коммита."""
+    old = list(post.image_variants.all())
+    if not old:
+        return
+    ImageVariant.objects.filter(pk__in=[v.pk for v in old]).delete()
+
+    def delete_files():
+        for variant in old:
+            variant.file.delete(save=False)
+
+    transaction.on_commit(delete_files)
+
+
+def sources(post):
+    """``srcset`` по форматам для шаблона; None, пока вариантов нет."""
+    variants = list(post.image_variants.all())
+    if not variants:
+        return None
+    result = []
+    for name, _, mime, _ in FORMATS:
+        chosen = [v for v in variants if v.format == name]
+        if chosen:
+            result.append({
+                'type': mime,
+                'srcset': ', '.join(
+                    f'{v.file.url} {v.width}w' for v in chosen
+                ),
+                'fallback': chosen[-1],
+            })
+    return result
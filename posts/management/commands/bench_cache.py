@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+
+def make_cache(config, location):
+    backend = import_string(config['BACKEND'])
+    params = {key: value for key, value in config.items()
+              if key not in ('BACKEND', 'LOCATION')}
+    return backend(location or config.get('LOCATION', ''), params)
+
+
+def worker(config, location, seed, ops, keys, miss_cost):
+    """Читает ключи с распределением Ципфа; на промахе «рендерит» и пишет."""
+    cache = make_cache(config, location)
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    names = [f'bench:{rank}' for rank in range(keys)]
+    hits, latencies = 0, []
+    started = time.perf_counter()
+    for key in rng.choices(names, weights, k=ops):
+        begin = time.perf_counter()
+        value = cache.get(key)
+        latencies.append(time.perf_counter() - begin)
+        if value is None:
+            time.sleep(miss_cost)
+            cache.set(key, 'x' * 2048, 300)
+        else:
+            hits += 1
+    return hits, latencies, time.perf_counter() - started
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает бэкенды кеша под многопроцессной нагрузкой: '
+            'доля попаданий, задержка чтения и пропускная способность.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', nargs='+',
+                            default=['locmem', 'sqlite'],
+                            help='имена из settings.CACHE_BACKENDS')
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--ops', type=int, default=5000,
+                            help='чтений на процесс')
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--miss-cost-ms', type=float, default=1.0,
+                            help='сколько стоит построить значение на промахе')
+
+    def handle(self, *args, **options):
+        unknown = set(options['backends']) - set(settings.CACHE_BACKENDS)
+        if unknown:
+            raise CommandError(f'Нет таких бэкендов: {", ".join(unknown)}')
+
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(
+            f'{"backend":<10}{"hit rate":>10}{"p50 us":>10}'
+            f'{"p95 us":>10}{"p99 us":>10}{"ops/s":>12}'
+        )
+        for name in options['backends']:
+            config = settings.CACHE_BACKENDS[name]
+            with tempfile.TemporaryDirectory() as directory:
+                location = None
+                if name == 'sqlite':
+                    location = os.path.join(directory, 'bench.sqlite3')
+                    make_cache(config, location).clear()
+                jobs = [
+                    (config, location, seed, options['ops'],
+                     options['keys'], options['miss_cost_ms'] / 1000)
+                    for seed in range(options['processes'])
+                ]
+                with context.Pool(options['processes']) as pool:
+                    results = pool.starmap(worker, jobs)
+
+            hits = sum(result[0] for result in results)
+            latencies = sorted(
+                latency for result in results for latency in result[1]
+            )
+            elapsed = max(result[2] for result in results)
+            self.stdout.write(
+                f'{name:<10}'
+                f'{hits / len(latencies):>10.1%}'
+                f'{statistics.median(latencies) * 1e6:>10.0f}'
+                f'{percentile(latencies, 0.95) * 1e6:>10.0f}'
+                f'{percentile(latencies, 0.99) * 1e6:>10.0f}'
+                f'{len(latencies) / elapsed:>12.0f}'
+            )
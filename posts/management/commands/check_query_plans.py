@@ -0,0 +1,157 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from posts import conditional, queries
+from posts.models import Group
+from posts.pagination import (CURSOR_PARAM, encode_cursor, page_redirect,
+                              paginate)
+from posts.views import _comments
+
+User = get_user_model()
+
+# Полный проход по таблице без индекса и сортировка во временном B-дереве.
+FULL_SCAN = re.compile(r'\bSCAN (TABLE )?\w+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+# Значения для подстановки в запросы: план от них не зависит.
+SAMPLE_ID = 1
+SAMPLE_NAME = 'query-plan-sample'
+
+
+def _request(user, **params):
+    request = RequestFactory().get('/', params)
+    request.user = user
+    return request
+
+
+def _pages(user, queryset, ordering=queries.POST_ORDERING, rows=list):
+    """Нумерованная первая страница и страница после курсора.
+
+    Страницы строит тот же ``paginate``, что и view: первая читает строку
+    сверх страницы, следующие идут по курсору.
+    """
+    page_redirect(_request(user, page=2), queryset, ordering=ordering)
+    cursor = encode_cursor(timezone.now(), SAMPLE_ID)
+    for params in ({}, {CURSOR_PARAM: cursor}):
+        _, page = paginate(_request(user, **params), queryset,
+                           ordering=ordering)
+        page.has_other_pages()
+        rows(page)
+        page.next_cursor
+
+
+def _index(viewer, author, group):
+    conditional.index_etag(_request(viewer))
+    _pages(viewer, queries.index_feed())
+
+
+def _group_posts(viewer, author, group):
+    conditional.group_etag(_request(viewer), group.slug)
+    _pages(viewer, queries.group_feed(group))
+
+
+def _profile(viewer, author, group):
+    conditional.profile_etag(_request(viewer), author.username)
+    _pages(viewer, queries.profile_feed(author))
+    queries.who_to_follow(viewer)
+
+
+def _follow_index(viewer, author, group):
+    _pages(viewer, queries.follow_feed(viewer),
+           ordering=queries.TIMELINE_ORDERING, rows=queries.posts_for)
+
+
+def _post_view(viewer, author, group):
+    conditional.post_etag(_request(viewer), author.username, SAMPLE_ID)
+    _comments(_request(viewer), SAMPLE_ID)
+    cursor = encode_cursor(timezone.now(), SAMPLE_ID)
+    _comments(_request(viewer, **{CURSOR_PARAM: cursor}), SAMPLE_ID)
+
+
+VIEWS = {
+    'index': _index,
+    'group_posts': _group_posts,
+    'profile': _profile,
+    'follow_index': _follow_index,
+    'post_view': _post_view,
+}
+
+
+def view_queries():
+    """Пары (страница, SQL) всех чтений, которые делают страницы.
+
+    Код страниц - ETag, пагинация, блоки - выполняется для гостя и для
+    пользователя, а запросы перехватываются. Образцы пользователя и группы
+    нужны, чтобы код дошел до всех запросов; после проверки они
+    откатываются.
+    """
+    found = []
+    with transaction.atomic():
+        author = User.objects.create(username=SAMPLE_NAME)
+        group = Group.objects.create(title=SAMPLE_NAME, slug=SAMPLE_NAME)
+        for name, view in VIEWS.items():
+            for viewer in (AnonymousUser(), author):
+                if not viewer.is_authenticated and name == 'follow_index':
+                    continue
+                with CaptureQueriesContext(connection) as context:
+                    view(viewer, author, group)
+                found += [
+                    (name, query['sql'])
+                    for query in context.captured_queries
+                    if query['sql'].lstrip().upper().startswith('SELECT')
+                ]
+        transaction.set_rollback(True)
+    # Одинаковые запросы гостя и пользователя проверяются один раз.
+    return list(dict.fromkeys(found))
+
+
+def explain(sql):
+    """План запроса в формате ``QuerySet.explain()`` для SQLite."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return '\n'.join(' '.join(map(str, row))
+                         for row in cursor.fetchall())
+
+
+def problems(plan):
+    for line in plan.splitlines():
+        detail = line.split(maxsplit=3)[-1]
+        if FULL_SCAN.search(detail) or TEMP_SORT in detail:
+            yield detail
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN QUERY PLAN для запросов каждой страницы и '
+            'падает, если запрос сканирует таблицу целиком или '
+            'сортирует во временном B-дереве.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка планов поддерживает только SQLite.')
+
+        failed = []
+        for name, sql in view_queries():
+            plan = explain(sql)
+            found = list(problems(plan))
+            if found:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f'FAIL {name}'))
+                self.stdout.write(f'    {sql}')
+                for detail in found:
+                    self.stdout.write(f'    {detail}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'ok   {name}'))
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{sql}\n{plan}')
+
+        if failed:
+            raise CommandError(
+                f'Плохие планы запросов: {", ".join(dict.fromkeys(failed))}'
+            )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts import caching, recommendations
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рекомендации «на кого подписаться» по графу '
+            'подписок. Запускается по расписанию, например раз в сутки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=recommendations.TOP_K,
+            help='сколько кандидатов хранить на пользователя',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=recommendations.BATCH_SIZE,
+            help='сколько пользователей записывать за одну транзакцию',
+        )
+
+    def handle(self, *args, **options):
+        users, rows = recommendations.compute(options['top'],
+                                              options['batch_size'])
+        # Блок рекомендаций входит в страницы, которые отдаются по ETag.
+        caching.bump_feed_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекомендации посчитаны: пользователей {users}, строк {rows}.'
+        ))
@@ -0,0 +1,38 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты или комментарии пользователя в JSONL или CSV, '
+            'либо все вместе с картинками в zip. Строки пишутся по мере '
+            'чтения из базы, память не растет с их числом.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--format', choices=export.FORMATS,
+                            default='jsonl')
+        parser.add_argument('--kind', choices=export.KINDS, default='posts',
+                            help='что выгружать в jsonl и csv')
+        parser.add_argument('--output', '-o',
+                            help='файл; по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f'Нет пользователя {options["username"]}.')
+        chunks = export.chunks(user, options['format'], options['kind'])
+        if options['output']:
+            with open(options['output'], 'wb') as file_:
+                for chunk in chunks:
+                    file_.write(chunk)
+            return
+        output = getattr(self.stdout._out, 'buffer', sys.stdout.buffer)
+        for chunk in chunks:
+            output.write(chunk)
+        output.flush()
@@ -0,0 +1,333 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import bulk, images
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+KINDS = ('posts', 'comments', 'follows')
+FORMATS = ('jsonl', 'csv')
+
+
+class RowError(ValueError):
+    """Строку нельзя загрузить; она пропускается с сообщением."""
+
+
+def read_rows(path, data_format):
+    """Поток словарей из JSONL или CSV, файл целиком в память не читается."""
+    with open(path, newline='', encoding='utf-8') as file_:
+        if data_format == 'csv':
+            yield from csv.DictReader(file_)
+            return
+        for number, line in enumerate(file_, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                raise CommandError(f'{path}:{number}: {error}')
+
+
+def parse_date(value, default):
+    if not value:
+        return default
+    date = parse_datetime(str(value))
+    if date is None:
+        raise RowError(f'непонятная дата {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def field(row, name):
+    """Значение поля строкой или None: в CSV пустое поле - это ''."""
+    value = row.get(name)
+    return None if value in (None, '') else str(value)
+
+
+def required(row, name):
+    value = field(row, name)
+    if value is None:
+        raise RowError(f'нет поля {name}')
+    return value
+
+
+class Command(BaseCommand):
+    help = ('Загружает посты, комментарии или подписки из JSONL или CSV '
+            'пачками через bulk_create. Авторы и группы ищутся по username '
+            'и slug, комментарии находят пост по его id в исходной системе. '
+            'После каждой пачки пишется контрольная точка: прерванную '
+            'загрузку можно запустить снова, она продолжит с того же места.'
+            '\n\nПоля: posts - id, author, text, group, pub_date, image; '
+            'comments - post, author, text, created; follows - user, author.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=KINDS)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='по умолчанию по расширению файла')
+        parser.add_argument('--batch-size', type=int,
+                            default=bulk.BATCH_SIZE,
+                            help='строк в одной транзакции')
+        parser.add_argument('--images-dir', default='',
+                            help='откуда брать картинки из поля image')
+        parser.add_argument('--create-missing', action='store_true',
+                            help='создавать незнакомых авторов (без пароля) '
+                                 'и группы; иначе такие строки пропускаются')
+        parser.add_argument('--checkpoint',
+                            help='файл контрольной точки; по умолчанию '
+                                 'рядом с входным, с суффиксом .checkpoint')
+        parser.add_argument('--restart', action='store_true',
+                            help='начать с начала, забыв контрольную точку')
+        parser.add_argument('--no-finish', action='store_true',
+                            help='не пересобирать ленты и счетчики: для '
+                                 'нескольких файлов подряд, кроме последнего')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        data_format = options['format'] or os.path.splitext(path)[1][1:]
+        if data_format not in FORMATS:
+            raise CommandError('Укажите --format: jsonl или csv.')
+        self.images_dir = options['images_dir']
+        self.create_missing = options['create_missing']
+        self.copied = {}
+        self.batch_images = []
+        self.checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        done = 0 if options['restart'] else self.load_checkpoint()
+        if done:
+            self.stdout.write(f'Продолжаем после строки {done}.')
+        # Пачка после контрольной точки могла закоммититься до сбоя, а
+        # точка - не записаться: ее строки сверяются с базой.
+        self.recheck = bool(done)
+
+        load = getattr(self, f'import_{options["kind"]}')
+        rows = islice(enumerate(read_rows(path, data_format), 1), done, None)
+        created = skipped = 0
+        started = time.perf_counter()
+        for batch in bulk.batched(rows, options['batch_size']):
+            self.batch_images = []
+            try:
+                with transaction.atomic():
+                    batch_created, batch_skipped = load(batch)
+            except BaseException:
+                self.discard_images()
+                raise
+            self.recheck = False
+            created += batch_created
+            skipped += batch_skipped
+            done = batch[-1][0]
+            self.save_checkpoint(done)
+            rate = (created + skipped) / (time.perf_counter() - started)
+            self.stdout.write(
+                f'{done} строк: загружено {created}, пропущено {skipped}, '
+                f'{rate:.0f} строк/с'
+            )
+
+        if not options['no_finish']:
+            bulk.finish(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: загружено {created}, пропущено {skipped}.'
+        ))
+        if self.copied:
+            self.stdout.write('Миниатюры подготовит pregenerate_thumbnails.')
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint) as file_:
+                return json.load(file_)['rows']
+        except FileNotFoundError:
+            return 0
+
+    def save_checkpoint(self, rows):
+        # Через временный файл: прерывание не оставит его наполовину.
+        temporary = f'{self.checkpoint}.tmp'
+        with open(temporary, 'w') as file_:
+            json.dump({'rows': rows}, file_)
+        os.replace(temporary, self.checkpoint)
+
+    def skip(self, number, error):
+        self.stderr.write(f'Строка {number}: {error}')
+
+    def load(self, batch, build):
+        """Строит объекты строк пачки; возвращает их и число пропущенных."""
+        objects, skipped = [], 0
+        for number, row in batch:
+            try:
+                objects.append(build(row))
+            except RowError as error:
+                self.skip(number, error)
+                skipped += 1
+        return objects, skipped
+
+    def users(self, batch, *names):
+        """id пользователей из полей пачки одним запросом."""
+        names = {field(row, name) for _, row in batch for name in names}
+        names.discard(None)
+        found = dict(User.objects.filter(username__in=names)
+                     .values_list('username', 'id'))
+        missing = names - found.keys()
+        if missing and self.create_missing:
+            password = make_password(None)
+            User.objects.bulk_create(
+                [User(username=name, password=password) for name in missing],
+                ignore_conflicts=True,
+            )
+            found.update(User.objects.filter(username__in=missing)
+                         .values_list('username', 'id'))
+        return found
+
+    def groups(self, batch):
+        slugs = {field(row, 'group') for _, row in batch}
+        slugs.discard(None)
+        found = dict(Group.objects.filter(slug__in=slugs)
+                     .values_list('slug', 'id'))
+        missing = slugs - found.keys()
+        if missing and self.create_missing:
+            Group.objects.bulk_create(
+                [Group(title=slug, slug=slug, description='')
+                 for slug in missing],
+                ignore_conflicts=True,
+            )
+            found.update(Group.objects.filter(slug__in=missing)
+                         .values_list('slug', 'id'))
+        return found
+
+    def reference(self, mapping, row, name, what):
+        key = required(row, name)
+        if key not in mapping:
+            raise RowError(f'нет {what} {key!r}')
+        return mapping[key]
+
+    def loaded(self, queryset, *fields):
+        """Ключи строк, уже загруженных до сбоя; вне первой пачки - пусто."""
+        if not self.recheck:
+            return set()
+        return set(queryset.values_list(*fields))
+
+    def discard_images(self):
+        """Удаляет картинки откаченной пачки: в базе на них нет ссылок."""
+        for relative in self.batch_images:
+            name, _ = self.copied.pop(relative)
+            default_storage.delete(name)
+        self.batch_images = []
+
+    def copy_image(self, relative):
+        """Копирует картинку в MEDIA_ROOT один раз на файл за запуск."""
+        if relative not in self.copied:
+            source = os.path.join(self.images_dir, relative)
+            try:
+                with open(source, 'rb') as file_:
+                    # Как и при загрузке через форму: без EXIF и геометок.
+                    content = images.strip_metadata(
+                        File(file_, name=os.path.basename(relative))
+                    )
+                    metadata = images.describe(content)
+                    name = default_storage.save(
+                        f'posts/{content.name}', content
+                    )
+            except (OSError, ValueError) as error:
+                raise RowError(f'картинка {relative}: {error}')
+            self.copied[relative] = name, metadata
+            self.batch_images.append(relative)
+        return self.copied[relative]
+
+    def import_posts(self, batch):
+        authors = self.users(batch, 'author')
+        groups = self.groups(batch)
+        keys = [field(row, 'id') for _, row in batch]
+        # Пачка могла загрузиться до сбоя, но не попасть в контрольную точку.
+        seen = set(Post.objects.filter(source_id__in=keys)
+                   .values_list('source_id', flat=True))
+        # Посты без id узнаются по автору и тексту.
+        anonymous = self.loaded(
+            Post.objects.filter(source_id=None,
+                                author_id__in=authors.values()),
+            'author_id', 'text'
+        )
+        now = timezone.now()
+
+        def build(row):
+            source_id = field(row, 'id')
+            if source_id is not None and source_id in seen:
+                raise RowError(f'пост {source_id} уже загружен')
+            seen.add(source_id)
+            author_id = self.reference(authors, row, 'author', 'автора')
+            text = required(row, 'text')
+            if source_id is None and (author_id, text) in anonymous:
+                raise RowError('пост уже загружен до сбоя')
+            date = parse_date(row.get('pub_date'), now)
+            post = Post(
+                source_id=source_id,
+                text=text,
+                author_id=author_id,
+                group_id=(self.reference(groups, row, 'group', 'группы')
+                          if field(row, 'group') else None),
+                pub_date=date,
+                updated=date,
+            )
+            if field(row, 'image'):
+                post.image, metadata = self.copy_image(row['image'])
+                for name, value in metadata.items():
+                    setattr(post, name, value)
+            return post
+
+        posts, skipped = self.load(batch, build)
+        with bulk.explicit_dates(Post, 'pub_date', 'updated'):
+            Post.objects.bulk_create(posts)
+        return len(posts), skipped
+
+    def import_comments(self, batch):
+        authors = self.users(batch, 'author')
+        keys = {field(row, 'post') for _, row in batch}
+        posts = dict(Post.objects.filter(source_id__in=keys)
+                     .values_list('source_id', 'id'))
+        # У комментариев нет своего id: узнаем их по посту, автору и тексту.
+        done = self.loaded(Comment.objects.filter(post_id__in=posts.values()),
+                           'post_id', 'author_id', 'text')
+        now = timezone.now()
+
+        def build(row):
+            comment = Comment(
+                post_id=self.reference(posts, row, 'post', 'поста'),
+                author_id=self.reference(authors, row, 'author', 'автора'),
+                text=required(row, 'text'),
+                created=parse_date(row.get('created'), now),
+            )
+            if (comment.post_id, comment.author_id, comment.text) in done:
+                raise RowError('комментарий уже загружен до сбоя')
+            return comment
+
+        comments, skipped = self.load(batch, build)
+        with bulk.explicit_dates(Comment, 'created'):
+            Comment.objects.bulk_create(comments)
+        return len(comments), skipped
+
+    def import_follows(self, batch):
+        users = self.users(batch, 'user', 'author')
+
+        def build(row):
+            follow = Follow(
+                user_id=self.reference(users, row, 'user', 'пользователя'),
+                author_id=self.reference(users, row, 'author', 'автора'),
+            )
+            if follow.user_id == follow.author_id:
+                raise RowError('подписка на себя')
+            return follow
+
+        follows, skipped = self.load(batch, build)
+        # Повтор пачки после сбоя и дубли во входе упираются в unique_follow.
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        return len(follows), skipped
@@ -0,0 +1,200 @@
+import http.cookiejar
+import random
+import re
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+CSRF_INPUT = re.compile(
+    r'name="csrfmiddlewaretoken" value="([^"]+)"'
+)
+# Доля запросов каждого вида; запись - примерно каждый двадцатый.
+MIX = {
+    'index': 30,
+    'group': 15,
+    'profile': 15,
+    'post': 20,
+    'follow_index': 15,
+    'add_comment': 4,
+    'new_post': 1,
+}
+SAMPLE = 500
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Client:
+    """Сессия пользователя поверх urllib: cookie и CSRF.
+
+    Редиректы не выполняются: после записи время страницы, на которую
+    ведет редирект, к самой записи не относится.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect
+        )
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            if 300 <= error.code < 400:
+                return error.code, b''
+            raise
+
+    def _csrf(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def get(self, path):
+        return self._open(self.base_url + path)
+
+    def post(self, path, data):
+        data = dict(data, csrfmiddlewaretoken=self._csrf())
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=urllib.parse.urlencode(data).encode(),
+            headers={'Referer': self.base_url + path},
+        )
+        return self._open(request)
+
+    def login(self, username, password):
+        path = reverse('login')
+        _, body = self.get(path)
+        match = CSRF_INPUT.search(body.decode())
+        if match is None:
+            raise CommandError('На странице входа нет CSRF-токена.')
+        self.post(path, {'username': username, 'password': password})
+        if not any(cookie.name == 'sessionid' for cookie in self.cookies):
+            raise CommandError(f'Не удалось войти как {username}.')
+
+
+class Command(BaseCommand):
+    help = ('Нагружает запущенный сервер смесью чтений и записей от '
+            'имени пользователей из seed_data и печатает пропускную '
+            'способность и задержки p50/p95/p99 по именам URL.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=30,
+                            help='секунд нагрузки')
+        parser.add_argument('--password', default='password')
+        parser.add_argument('--user-prefix', default='seed')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        usernames = list(
+            User.objects.filter(username__startswith=options['user_prefix'])
+            .order_by('?').values_list('username', flat=True)[:SAMPLE]
+        )
+        if not usernames:
+            raise CommandError('Нет пользователей: сначала seed_data.')
+        self.slugs = list(Group.objects.values_list('slug', flat=True)
+                          .order_by('?')[:SAMPLE])
+        self.posts = list(Post.objects.values_list('author__username', 'id')
+                          .order_by('?')[:SAMPLE])
+
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+        threads = [
+            threading.Thread(target=self.worker, args=(
+                options['base_url'], usernames[i % len(usernames)],
+                options['password'], random.Random(options['seed'] + i),
+                deadline,
+            ))
+            for i in range(options['concurrency'])
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.report(time.monotonic() - started)
+
+    def request(self, client, name, rng):
+        if name == 'index':
+            return client.get(reverse('index'))
+        if name == 'group':
+            return client.get(reverse('group', args=[rng.choice(self.slugs)]))
+        if name == 'follow_index':
+            return client.get(reverse('follow_index'))
+        username, post_id = rng.choice(self.posts)
+        if name == 'profile':
+            return client.get(reverse('profile', args=[username]))
+        if name == 'post':
+            return client.get(reverse('post', args=[username, post_id]))
+        if name == 'add_comment':
+            return client.post(reverse('add_comment',
+                                       args=[username, post_id]),
+                               {'text': 'Нагрузочный комментарий'})
+        return client.post(reverse('new_post'),
+                           {'text': 'Нагрузочный пост'})
+
+    def worker(self, base_url, username, password, rng, deadline):
+        client = Client(base_url)
+        client.login(username, password)
+        names = [name for name in MIX if name != 'group' or self.slugs]
+        weights = [MIX[name] for name in names]
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            begin = time.perf_counter()
+            try:
+                self.request(client, name, rng)
+            except (urllib.error.URLError, OSError):
+                with self.lock:
+                    self.errors[name] += 1
+                continue
+            elapsed = time.perf_counter() - begin
+            with self.lock:
+                self.latencies[name].append(elapsed)
+
+    def report(self, elapsed):
+        self.stdout.write(
+            f'{"url":<14}{"count":>8}{"req/s":>9}{"errors":>8}'
+            f'{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+        )
+        total = 0
+        for name in MIX:
+            values = sorted(self.latencies.get(name, ()))
+            total += len(values)
+            if not values:
+                continue
+            self.stdout.write(
+                f'{name:<14}{len(values):>8}{len(values) / elapsed:>9.1f}'
+                f'{self.errors[name]:>8}'
+                f'{statistics.median(values) * 1000:>9.1f}'
+                f'{percentile(values, 0.95) * 1000:>9.1f}'
+                f'{percentile(values, 0.99) * 1000:>9.1f}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Всего {total} запросов за {elapsed:.1f} с, '
+            f'{total / elapsed:.1f} req/s, ошибок {sum(self.errors.values())}.'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Готовит миниатюры и варианты для всех картинок постов, '
+            'заодно заполняя размеры и превью у старых постов.')
+
+    def handle(self, *args, **options):
+        post_ids = (
+            Post.objects.exclude(image='').exclude(image=None)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        failed = 0
+        for post_id in post_ids.iterator():
+            try:
+                thumbnails.generate(post_id)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'{post_id}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры готовы, ошибок: {failed}.'
+        ))
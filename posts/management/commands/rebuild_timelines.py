@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'user_ids', nargs='*', type=int,
+            help='id пользователей; по умолчанию пересобираются все ленты',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids'] or None
+        with transaction.atomic():
+            count = timeline.rebuild(user_ids)
+        self.stdout.write(
+            self.style.SUCCESS(f'Лент пересобрано по {count} подпискам.')
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = ('Сверяет денормализованные счетчики постов, комментариев и '
+            'подписок с данными и исправляет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=counters.BATCH_SIZE,
+            help='сколько строк сверять за один проход',
+        )
+
+    def handle(self, *args, **options):
+        fixed_users, fixed_posts = counters.reconcile(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено: пользователей {fixed_users}, постов {fixed_posts}.'
+        ))
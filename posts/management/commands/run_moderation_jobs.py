@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import moderation
+from posts.models import ModerationJob
+
+
+class Command(BaseCommand):
+    help = ('Выполняет задания модерации из очереди в этом процессе. '
+            'С --resume продолжает и упавшие, и те, что остались «в работе» '
+            'после остановки сервера: каждое начнет с первой '
+            'незавершенной пачки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resume', action='store_true',
+                            help='взять и задания в статусах «Идет» и '
+                                 '«Ошибка»')
+
+    def handle(self, *args, **options):
+        statuses = [ModerationJob.PENDING]
+        if options['resume']:
+            statuses += [ModerationJob.RUNNING, ModerationJob.FAILED]
+        jobs = ModerationJob.objects.filter(status__in=statuses)
+        for job_id in jobs.order_by('pk').values_list('pk', flat=True):
+            job = moderation.run(job_id)
+            self.stdout.write(
+                f'{job}: {job.get_status_display()}, '
+                f'{job.processed} из {job.total}'
+            )
@@ -0,0 +1,181 @@
+import io
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from posts import bulk, images
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+PREFIX = 'seed'
+WORDS = ('пост', 'лента', 'подписка', 'картинка', 'утро', 'вечер', 'город',
+         'море', 'кофе', 'книга', 'музыка', 'дорога', 'друзья', 'работа',
+         'ёжик', 'туман', 'новости', 'погода', 'кино', 'прогулка')
+
+
+def skewed(rng, population, k):
+    """Выбор с весами 1/rank: немногие популярны, большинство - нет."""
+    weights = [1 / (rank + 1) for rank in range(len(population))]
+    return rng.choices(population, weights, k=k)
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими данными: пользователи, группы, '
+            'посты с картинками, комментарии и подписки. Пароль у всех '
+            'пользователей один, его использует команда loadtest.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--images', type=int, default=20,
+                            help='сколько разных картинок сгенерировать')
+        parser.add_argument('--image-share', type=float, default=0.2,
+                            help='доля постов с картинкой')
+        parser.add_argument('--days', type=int, default=365,
+                            help='за сколько дней раскидать даты')
+        parser.add_argument('--password', default='password')
+        parser.add_argument('--batch-size', type=int,
+                            default=bulk.BATCH_SIZE)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days'])
+
+        user_ids = self.seed_users(options['users'], options['password'])
+        group_ids = self.seed_groups(options['groups'])
+        pictures = self.seed_images(options['images'])
+        post_ids = self.seed_posts(options['posts'], user_ids, group_ids,
+                                   pictures, options['image_share'])
+        self.seed_comments(options['comments'], user_ids, post_ids)
+        self.seed_follows(options['follows'], user_ids)
+
+        follows, (users, posts) = bulk.finish(self.batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: подписок в лентах {follows}, '
+            f'счетчиков поправлено {users + posts}.'
+        ))
+
+    def log(self, message):
+        self.stdout.write(message)
+
+    def random_date(self):
+        return self.now - self.span * self.rng.random()
+
+    def text(self, words):
+        return ' '.join(self.rng.choices(WORDS, k=words)).capitalize()
+
+    def create(self, model, objects):
+        count = 0
+        for batch in bulk.batched(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            count += len(batch)
+        return count
+
+    def seed_users(self, count, password):
+        start = User.objects.count()
+        # Хеш пароля считается один раз: PBKDF2 на каждого - это минуты.
+        hashed = make_password(password)
+        self.create(User, (
+            User(username=f'{PREFIX}{start + i}', password=hashed,
+                 first_name='Пользователь', last_name=str(start + i))
+            for i in range(count)
+        ))
+        self.log(f'Пользователей: {count}')
+        return list(User.objects.filter(username__startswith=PREFIX)
+                    .values_list('id', flat=True))
+
+    def seed_groups(self, count):
+        start = Group.objects.count()
+        self.create(Group, (
+            Group(title=f'Группа {start + i}', slug=f'{PREFIX}-{start + i}',
+                  description=self.text(12))
+            for i in range(count)
+        ))
+        self.log(f'Групп: {count}')
+        return list(Group.objects.values_list('id', flat=True))
+
+    def seed_images(self, count):
+        pictures = []
+        for i in range(count):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            size = (self.rng.randrange(600, 2000),
+                    self.rng.randrange(400, 1400))
+            buffer = io.BytesIO()
+            Image.new('RGB', size, color).save(buffer, 'JPEG', quality=85)
+            content = ContentFile(buffer.getvalue())
+            name = default_storage.save(f'posts/{PREFIX}-{i}.jpg', content)
+            with default_storage.open(name) as file_:
+                pictures.append((name, images.describe(file_)))
+        self.log(f'Картинок: {count}')
+        return pictures
+
+    def seed_posts(self, count, user_ids, group_ids, pictures, image_share):
+        authors = skewed(self.rng, user_ids, count)
+
+        def posts():
+            for author_id in authors:
+                date = self.random_date()
+                post = Post(
+                    text=self.text(self.rng.randrange(5, 60)),
+                    author_id=author_id,
+                    group_id=(self.rng.choice(group_ids)
+                              if group_ids and self.rng.random() < 0.5
+                              else None),
+                    pub_date=date,
+                    updated=date,
+                )
+                if pictures and self.rng.random() < image_share:
+                    name, metadata = self.rng.choice(pictures)
+                    post.image = name
+                    for field, value in metadata.items():
+                        setattr(post, field, value)
+                yield post
+
+        with bulk.explicit_dates(Post, 'pub_date', 'updated'):
+            self.create(Post, posts())
+        self.log(f'Постов: {count}')
+        return list(Post.objects.values_list('id', flat=True))
+
+    def seed_comments(self, count, user_ids, post_ids):
+        if not post_ids:
+            return
+        targets = skewed(self.rng, post_ids, count)
+        with bulk.explicit_dates(Comment, 'created'):
+            self.create(Comment, (
+                Comment(post_id=post_id,
+                        author_id=self.rng.choice(user_ids),
+                        text=self.text(self.rng.randrange(3, 20)),
+                        created=self.random_date())
+                for post_id in targets
+            ))
+        self.log(f'Комментариев: {count}')
+
+    def seed_follows(self, count, user_ids):
+        authors = skewed(self.rng, user_ids, count)
+        pairs = {
+            (self.rng.choice(user_ids), author_id) for author_id in authors
+        }
+        pairs = [(user, author) for user, author in pairs if user != author]
+        for batch in bulk.batched(pairs, self.batch_size):
+            Follow.objects.bulk_create(
+                [Follow(user_id=user, author_id=author)
+                 for user, author in batch],
+                ignore_conflicts=True,
+            )
+        self.log(f'Подписок: {len(pairs)}')
@@ -0,0 +1,58 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def replica_path(name):
+    """Путь к файлу из NAME реплики вида ``file:/path?mode=ro``."""
+    if name.startswith('file:'):
+        return name[len('file:'):].split('?')[0]
+    return name
+
+
+def copy(primary, path, pages):
+    # Копия собирается рядом и подменяет реплику целиком: читатели не
+    # увидят файл наполовину.
+    temporary = f'{path}.tmp'
+    source = sqlite3.connect(primary)
+    target = sqlite3.connect(temporary)
+    try:
+        # Между шагами по pages страниц основная база открыта для записи.
+        source.backup(target, pages=pages)
+    finally:
+        target.close()
+        source.close()
+    os.replace(temporary, path)
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик из '
+            'YATUBE_DB_REPLICAS через backup API, чтобы проверить чтение '
+            'с реплик локально. С --interval копирует по кругу, изображая '
+            'отставание реплики.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='секунд между копированиями; 0 - один раз')
+        parser.add_argument('--pages', type=int, default=1024,
+                            help='страниц за шаг копирования')
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES['default']['NAME']
+        paths = [replica_path(settings.DATABASES[alias]['NAME'])
+                 for alias in settings.DATABASE_REPLICAS]
+        if not paths:
+            raise CommandError('Реплик нет: задайте YATUBE_DB_REPLICAS.')
+        while True:
+            for path in paths:
+                started = time.perf_counter()
+                copy(primary, path, options['pages'])
+                self.stdout.write(
+                    f'{path}: {time.perf_counter() - started:.2f} с'
+                )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
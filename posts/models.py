@@ -24,12 +24,33 @@ class Post(models.Model):
                               blank=True, null=True,
                               related_name='posts')
     image = models.ImageField(upload_to='posts/', blank=True, null=True) 
+    # Заполняются при сохранении картинки, чтобы не открывать файл
+    # ради размеров и превью (см. posts.images.describe).
+    image_width = models.PositiveIntegerField(null=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, editable=False)
+    image_size = models.PositiveIntegerField(null=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # Версия карточки: меняется при правке поста и при новых комментариях.
+    updated = models.DateTimeField(auto_now=True, db_index=True)
+    # Ключ поста в системе, откуда его перенесли командой import_content:
+    # по нему находятся посты для комментариев и пропускаются дубли.
+    source_id = models.CharField(max_length=100, unique=True, null=True,
+                                 blank=True, editable=False)
 
     def __str__(self):
        return self.text[:15]
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -42,7 +63,13 @@ class Comment(models.Model):
     text = models.TextField(blank=False, null=False,
                             verbose_name='Комментарий',
                             help_text='Ваш комментарий')
-    created = models.DateTimeField(auto_now_add=True)  
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -64,3 +91,161 @@ class Follow(models.Model):
                 fields=["user", "author"], name="unique_follow"
             )
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Счетчики пользователя, которые иначе пришлось бы считать COUNT(*).
+
+    Меняются атомарно через F() при создании и удалении постов и подписок,
+    расхождения чинит команда reconcile_counters.
+    """
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='stats')
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"stats - {self.user_id}"
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя.
+
+    Строки появляются при публикации поста (fan-out on write) и при
+    подписке, удаляются при отписке. ``pub_date`` копируется из поста,
+    чтобы страница ленты читалась одним диапазоном по индексу.
+    """
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+
+
+class ImageVariant(models.Model):
+    """Уменьшенная копия картинки поста для ``srcset``.
+
+    Варианты строит фоновый воркер миниатюр: по каждой ширине из
+    ``posts.images.WIDTHS`` в каждом формате из ``posts.images.FORMATS``.
+    """
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='image_variants')
+    format = models.CharField(max_length=8)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    file = models.ImageField(upload_to='posts/variants/')
+
+    class Meta:
+        ordering = ['format', 'width']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'format', 'width'],
+                name='unique_image_variant'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} - {self.format} {self.width}w"
+
+
+class Recommendation(models.Model):
+    """Автор, на которого стоит подписаться пользователю.
+
+    Списки считает команда compute_recommendations по графу подписок и
+    хранит первые ``posts.recommendations.TOP_K`` для каждого
+    пользователя, страница читает их одним запросом по индексу.
+    """
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='recommendations')
+    candidate = models.ForeignKey(User,
+                                  on_delete=models.CASCADE,
+                                  related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'rank'], name='unique_recommendation_rank'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.candidate_id} ({self.rank})"
+
+
+class ModerationJob(models.Model):
+    """Массовая правка из админки, которая идет в фоне пачками.
+
+    Действие выполняет ``posts.moderation``: каждая пачка - отдельная
+    короткая транзакция, вместе с ней сохраняется ``processed``, так что
+    прерванное задание продолжает команда run_moderation_jobs.
+    """
+    REASSIGN_GROUP = 'reassign_group'
+    DELETE_POSTS = 'delete_posts'
+    DELETE_COMMENTS = 'delete_comments'
+    ACTIONS = (
+        (REASSIGN_GROUP, 'Перенос постов в группу'),
+        (DELETE_POSTS, 'Удаление постов автора'),
+        (DELETE_COMMENTS, 'Удаление комментариев автора'),
+    )
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Идет'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    action = models.CharField(max_length=20, choices=ACTIONS)
+    status = models.CharField(max_length=10, choices=STATUSES,
+                              default=PENDING, db_index=True)
+    # Чьи посты или комментарии удалить.
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               null=True, blank=True, related_name='+')
+    # Куда перенести посты; пусто - убрать из группы.
+    group = models.ForeignKey(Group, on_delete=models.SET_NULL,
+                              null=True, blank=True, related_name='+')
+    # id переносимых постов через запятую, в порядке обработки.
+    post_ids = models.TextField(blank=True)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL,
+                                   null=True, related_name='+')
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created']
+        verbose_name = 'Задание модерации'
+        verbose_name_plural = 'Задания модерации'
+
+    def __str__(self):
+        return f"{self.get_action_display()} #{self.pk}"
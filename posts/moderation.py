@@ -0,0 +1,167 @@
+"""Массовые действия модерации, которые идут в фоне пачками.
+
+Админка только создает ``ModerationJob`` и ставит его в очередь после
+коммита. Воркер проходит строки пачками по ``CHUNK_SIZE``: каждая пачка -
+своя короткая транзакция, и SQLite не держит блокировку записи дольше
+нее. Удаление идет мимо сигналов (по одному на строку и каскад), а
+счетчики и версия ленты правятся разом на пачку.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import caching, counters
+from .models import (Comment, ImageVariant, ModerationJob, Post,
+                     TimelineEntry)
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.MODERATION_WORKERS,
+                thread_name_prefix='moderation',
+            )
+    return _executor
+
+
+def _raw_delete(queryset):
+    # Без сборщика каскада и сигналов: зависимые строки пачки удаляются
+    # явно, до самих постов.
+    return queryset._raw_delete(queryset.db)
+
+
+def _next_ids(queryset):
+    return list(queryset.order_by('pk').values_list('pk', flat=True)
+                [:CHUNK_SIZE])
+
+
+def _reassign_group(job):
+    ids = [int(pk) for pk in job.post_ids.split(',') if pk]
+    while job.processed < len(ids):
+        chunk = ids[job.processed:job.processed + CHUNK_SIZE]
+        # updated - версия закешированных карточек.
+        Post.objects.filter(pk__in=chunk).update(
+            group=job.group, updated=timezone.now()
+        )
+        yield len(chunk)
+
+
+def _delete_files(names):
+    for name in names:
+        default_storage.delete(name)
+
+
+def _delete_posts(job):
+    while True:
+        chunk = _next_ids(Post.objects.filter(author=job.author))
+        if not chunk:
+            return
+        # Как images.delete_variants: файлы вариантов - после коммита пачки.
+        files = list(ImageVariant.objects.filter(post_id__in=chunk)
+                     .values_list('file', flat=True))
+        transaction.on_commit(lambda files=files: _delete_files(files))
+        for model in (Comment, TimelineEntry, ImageVariant):
+            _raw_delete(model.objects.filter(post_id__in=chunk))
+        _raw_delete(Post.objects.filter(pk__in=chunk))
+        counters.recount_users([job.author_id])
+        yield len(chunk)
+
+
+def _delete_comments(job):
+    while True:
+        chunk = list(
+            Comment.objects.filter(author=job.author).order_by('pk')
+            .values_list('pk', 'post_id')[:CHUNK_SIZE]
+        )
+        if not chunk:
+            return
+        _raw_delete(Comment.objects.filter(pk__in=[pk for pk, _ in chunk]))
+        counters.recount_posts(list({post_id for _, post_id in chunk}))
+        yield len(chunk)
+
+
+ACTIONS = {
+    ModerationJob.REASSIGN_GROUP: _reassign_group,
+    ModerationJob.DELETE_POSTS: _delete_posts,
+    ModerationJob.DELETE_COMMENTS: _delete_comments,
+}
+
+
+def count(action, author=None, post_ids=()):
+    """Сколько строк затронет действие: для прогресса в админке."""
+    if action == ModerationJob.REASSIGN_GROUP:
+        return len(post_ids)
+    if action == ModerationJob.DELETE_POSTS:
+        return Post.objects.filter(author=author).count()
+    return Comment.objects.filter(author=author).count()
+
+
+def create(action, created_by, author=None, group=None, post_ids=()):
+    """Создает задание и ставит его в очередь после коммита."""
+    post_ids = list(post_ids)
+    job = ModerationJob.objects.create(
+        action=action, created_by=created_by, author=author, group=group,
+        post_ids=','.join(map(str, post_ids)),
+        total=count(action, author, post_ids),
+    )
+    transaction.on_commit(lambda: submit(job.pk))
+    return job
+
+
+def run(job_id):
+    """Выполняет задание с места, где оно остановилось."""
+    job = ModerationJob.objects.get(pk=job_id)
+    if job.status == ModerationJob.DONE:
+        return job
+    job.status = ModerationJob.RUNNING
+    job.started = job.started or timezone.now()
+    job.save(update_fields=['status', 'started'])
+    steps = ACTIONS[job.action](job)
+    try:
+        while True:
+            with transaction.atomic():
+                done = next(steps, None)
+                if done is None:
+                    break
+                # Прогресс в той же транзакции, что и пачка: после сбоя
+                # задание продолжится ровно с нее.
+                job.processed += done
+                job.save(update_fields=['processed'])
+            caching.bump_feed_version()
+    except Exception as error:
+        logger.exception('Задание модерации %s упало', job.pk)
+        job.status = ModerationJob.FAILED
+        job.error = str(error)
+    else:
+        job.status = ModerationJob.DONE
+    job.finished = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished'])
+    return job
+
+
+def _background(job_id):
+    try:
+        run(job_id)
+    finally:
+        connection.close()
+
+
+def submit(job_id):
+    if not settings.MODERATION_WORKERS:
+        run(job_id)
+        return
+    _pool().submit(_background, job_id)
@@ -0,0 +1,183 @@
+import base64
+import binascii
+from collections.abc import Sequence
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.shortcuts import redirect
+from django.utils.dateparse import parse_datetime
+
+PER_PAGE = 10
+CURSOR_PARAM = 'after'
+
+
+def encode_cursor(value, pk):
+    """Упаковывает пару (значение поля сортировки, id) в непрозрачный токен."""
+    raw = f'{value.isoformat()},{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (datetime, id) или None, если токен испорчен."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        value, pk = raw.rsplit(',', 1)
+        value = parse_datetime(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+class CursorPage(Sequence):
+    """Страница keyset-пагинации.
+
+    Вместо OFFSET выбирает строки строго после курсора, поэтому стоимость
+    страницы не зависит от глубины и не съезжает при новых записях.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, cursor):
+        self._object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self._rows = None
+
+    def _fetch(self):
+        if self._rows is None:
+            rows = list(self._object_list[:self.paginator.per_page + 1])
+            self._has_next = len(rows) > self.paginator.per_page
+            self._rows = rows[:self.paginator.per_page]
+        return self._rows
+
+    @property
+    def object_list(self):
+        return self._fetch()
+
+    @object_list.setter
+    def object_list(self, value):
+        self._fetch()
+        self._rows = list(value)
+
+    def __len__(self):
+        return len(self._fetch())
+
+    def __getitem__(self, index):
+        return self._fetch()[index]
+
+    def __repr__(self):
+        return f'<CursorPage after {self.cursor!r}>'
+
+    def has_next(self):
+        self._fetch()
+        return self._has_next
+
+    def has_previous(self):
+        return self.cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.cursor_for(self._fetch()[-1])
+
+
+class CursorPaginator:
+    """Пагинатор по ключу (поле сортировки, id) без COUNT(*) и OFFSET.
+
+    ``ordering`` задает порядок выдачи, например ``('-pub_date', '-id')``;
+    оба поля должны идти в одном направлении.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.ordering = ordering
+        self.descending = ordering[0].startswith('-')
+        self.value_field, self.id_field = (
+            name.lstrip('-') for name in ordering
+        )
+
+    def cursor_for(self, obj):
+        if isinstance(obj, dict):
+            return encode_cursor(obj[self.value_field], obj[self.id_field])
+        return encode_cursor(
+            getattr(obj, self.value_field), getattr(obj, self.id_field)
+        )
+
+    def after(self, cursor):
+        """Queryset строк строго после курсора (value, id)."""
+        queryset = self.object_list.order_by(*self.ordering)
+        if cursor is None:
+            return queryset
+        value, pk = cursor
+        lookup = 'lt' if self.descending else 'gt'
+        # Нестрогая граница по первому полю нужна планировщику, чтобы
+        # начать поиск по индексу с курсора, а не сканировать с начала.
+        return queryset.filter(
+            Q(**{f'{self.value_field}__{lookup}e': value}),
+            Q(**{f'{self.value_field}__{lookup}': value})
+            | Q(**{f'{self.id_field}__{lookup}': pk})
+        )
+
+    def page(self, token):
+        cursor = decode_cursor(token) if token else None
+        return CursorPage(self.after(cursor), self, token if cursor else None)
+
+
+def paginate(request, object_list, per_page=PER_PAGE,
+             ordering=('-pub_date', '-id')):
+    """Возвращает (paginator, page) для ленты.
+
+    Первая страница - обычный нумерованный ``Paginator``, но без COUNT(*):
+    читается на строку больше страницы, и по ней видно, есть ли следующая.
+    Ссылка на следующую ведет на ``?after=<курсор>``, дальше страницы
+    выбираются по ключу, без OFFSET. Старые ссылки ``?page=N`` уводит на
+    курсор ``page_redirect``.
+    """
+    cursors = CursorPaginator(object_list, per_page, ordering)
+    token = request.GET.get(CURSOR_PARAM)
+    if token is not None:
+        return cursors, cursors.page(token)
+
+    paginator = Paginator(object_list.order_by(*ordering), per_page)
+    rows = list(paginator.object_list[:per_page + 1])
+    # count нужен Page только для has_next: лишняя строка означает, что
+    # есть вторая страница. Всего строк пагинатор не знает.
+    paginator.count = len(rows)
+    page = Page(rows[:per_page], 1, paginator)
+    # Курсор из исходных строк: лента подписок потом подменяет
+    # object_list постами.
+    page.next_cursor = (cursors.cursor_for(rows[per_page - 1])
+                        if len(rows) > per_page else None)
+    return paginator, page
+
+
+def page_redirect(request, object_list, per_page=PER_PAGE,
+                  ordering=('-pub_date', '-id')):
+    """Редирект со старой ссылки ``?page=N`` на курсорную страницу.
+
+    Номеров страниц больше нет, поэтому любая страница после первой ведет
+    на вторую. Без номера или с первым возвращает None.
+    """
+    try:
+        number = int(request.GET.get('page', 1))
+    except ValueError:
+        return None
+    if number <= 1:
+        return None
+    query = request.GET.copy()
+    del query['page']
+    # Последняя строка первой страницы: OFFSET на одну страницу.
+    last = object_list.order_by(*ordering)[per_page - 1:per_page]
+    for row in last:
+        query[CURSOR_PARAM] = CursorPaginator(
+            object_list, per_page, ordering
+        ).cursor_for(row)
+    return redirect(f'{request.path}?{query.urlencode()}')
@@ -0,0 +1,67 @@
+from .models import Comment, Follow, Post, Recommendation, TimelineEntry
+
+# Порядок выдачи лент; совпадает с индексами постов и ленты подписок.
+POST_ORDERING = ('-pub_date', '-id')
+TIMELINE_ORDERING = ('-pub_date', '-post_id')
+# Комментарии читаются от старых к новым по индексу (post, created, id).
+COMMENT_ORDERING = ('created', 'id')
+
+
+def feed_posts():
+    """Посты для карточек ленты: автор и группа приходят тем же запросом.
+
+    Число комментариев карточка берет из денормализованного
+    ``comments_count``, отдельного COUNT на пост нет.
+    """
+    return Post.objects.select_related('author', 'group')
+
+
+def index_feed():
+    return feed_posts()
+
+
+def group_feed(group):
+    return feed_posts().filter(group=group)
+
+
+def profile_feed(author):
+    return feed_posts().filter(author=author)
+
+
+def follow_feed(user):
+    """Записи ленты подписок; посты к ним подгружает ``posts_for``."""
+    return TimelineEntry.objects.filter(user=user).only('post_id', 'pub_date')
+
+
+def posts_for(entries):
+    """Посты для записей ленты подписок в том же порядке."""
+    ids = [entry.post_id for entry in entries]
+    posts = feed_posts().in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
+
+
+def post_comments(post_id):
+    """Комментарии поста вместе с авторами одним запросом."""
+    return Comment.objects.filter(post_id=post_id).select_related('author')
+
+
+def recommendations_for(user):
+    """Рекомендации по индексу (user, rank) без уже взятых подписок."""
+    return (
+        Recommendation.objects.filter(user=user)
+        .exclude(candidate_id__in=Follow.objects.filter(user=user)
+                 .values('author_id'))
+        .select_related('candidate')
+        .order_by('rank')
+    )
+
+
+def who_to_follow(user, limit=5):
+    """Блок «на кого подписаться»: один запрос на страницу.
+
+    Авторов, на которых пользователь подписался после пересчета, запрос
+    сразу отбрасывает.
+    """
+    if not user.is_authenticated:
+        return []
+    return list(recommendations_for(user)[:limit])
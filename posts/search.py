@@ -0,0 +1,186 @@
+"""Полнотекстовый поиск по постам на индексе SQLite FTS5.
+
+Таблица ``posts_post_fts`` хранит только индекс (``content='posts_post'``),
+текст берется из самих постов; синхронность держат триггеры. Токенайзер
+unicode61 приводит кириллицу к нижнему регистру, «ё» сводится к «е»,
+а каждое слово запроса ищется как префикс, что заменяет стемминг для
+русских окончаний.
+
+Django пересоздает таблицу ``posts_post`` при миграциях на SQLite, и
+триггеры пропадают вместе с ней, поэтому ``install`` вызывается после
+каждого ``migrate`` и переиндексирует посты, если триггеров не было.
+"""
+import base64
+import binascii
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from . import queries
+from .pagination import CursorPage
+
+TABLE = 'posts_post_fts'
+PER_PAGE = 10
+MAX_TERMS = 8
+
+CREATE_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    f" text, content='posts_post', content_rowid='id',"
+    f" tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+# unicode61 не считает «ё» буквой с диакритикой, поэтому сводим ее к «е»
+# сами: в индексе и в запросе.
+_FOLD = "replace(replace({}, 'ё', 'е'), 'Ё', 'Е')"
+TRIGGERS = {
+    f'{TABLE}_insert': (
+        f"CREATE TRIGGER {TABLE}_insert AFTER INSERT ON posts_post BEGIN"
+        f" INSERT INTO {TABLE}(rowid, text)"
+        f" VALUES (new.id, {_FOLD.format('new.text')});"
+        f" END"
+    ),
+    f'{TABLE}_delete': (
+        f"CREATE TRIGGER {TABLE}_delete AFTER DELETE ON posts_post BEGIN"
+        f" INSERT INTO {TABLE}({TABLE}, rowid, text)"
+        f" VALUES ('delete', old.id, {_FOLD.format('old.text')});"
+        f" END"
+    ),
+    f'{TABLE}_update': (
+        f"CREATE TRIGGER {TABLE}_update AFTER UPDATE OF text ON posts_post"
+        f" BEGIN"
+        f" INSERT INTO {TABLE}({TABLE}, rowid, text)"
+        f" VALUES ('delete', old.id, {_FOLD.format('old.text')});"
+        f" INSERT INTO {TABLE}(rowid, text)"
+        f" VALUES (new.id, {_FOLD.format('new.text')});"
+        f" END"
+    ),
+}
+
+
+def available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection):
+    """Создает индекс и недостающие триггеры; возвращает True, если
+    пришлось переиндексировать посты."""
+    if not available(using):
+        return False
+    with using.cursor() as cursor:
+        cursor.execute(CREATE_TABLE)
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(TRIGGERS[name])
+        if missing:
+            rebuild(using)
+    return bool(missing)
+
+
+def uninstall(using=connection):
+    if not available(using):
+        return
+    with using.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+def rebuild(using=connection):
+    """Перестраивает индекс по текущему содержимому posts_post."""
+    # Не 'rebuild': он проиндексировал бы текст без свертки «ё».
+    with using.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('delete-all')")
+        cursor.execute(
+            f"INSERT INTO {TABLE}(rowid, text)"
+            f" SELECT id, {_FOLD.format('text')} FROM posts_post"
+        )
+
+
+def match_expression(query):
+    """Запрос пользователя как выражение MATCH: все слова, каждое префиксом.
+
+    Слова берутся в кавычки, так что синтаксис FTS5 (OR, NEAR, скобки)
+    из строки поиска не интерпретируется.
+    """
+    query = query.lower().replace('ё', 'е')
+    terms = re.findall(r'\w+', query)[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms) or None
+
+
+def encode_cursor(rank, pk):
+    raw = f'{rank!r},{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        rank, pk = raw.rsplit(',', 1)
+        return float(rank), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def ranked_ids(match, cursor=None, limit=PER_PAGE):
+    """[(id, rank)] по релевантности bm25, строго после курсора."""
+    sql = (
+        f'SELECT rowid, rank FROM {TABLE} WHERE {TABLE} MATCH %s'
+    )
+    params = [match]
+    if cursor is not None:
+        sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+        params += [cursor[0], cursor[0], cursor[1]]
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as db:
+        db.execute(sql, params)
+        return db.fetchall()
+
+
+class _Results:
+    """Срез выдачи для ``CursorPage``: ids из индекса, посты по ключу."""
+
+    def __init__(self, match, cursor):
+        self.match = match
+        self.cursor = cursor
+
+    def __getitem__(self, item):
+        ranked = ranked_ids(self.match, self.cursor, item.stop)
+        posts = queries.feed_posts().in_bulk([pk for pk, _ in ranked])
+        result = []
+        for pk, rank in ranked:
+            if pk in posts:
+                posts[pk].search_rank = rank
+                result.append(posts[pk])
+        return result
+
+
+class SearchPaginator:
+    """Курсорный пагинатор по паре (rank, id) для ``CursorPage``."""
+
+    def __init__(self, query, per_page=PER_PAGE):
+        self.match = match_expression(query)
+        self.per_page = per_page
+
+    def cursor_for(self, post):
+        return encode_cursor(post.search_rank, post.pk)
+
+    def page(self, token):
+        cursor = decode_cursor(token) if token else None
+        results = _Results(self.match, cursor) if self.match else []
+        return CursorPage(results, self, token if cursor else None)
+
+
+def filter_queryset(queryset, query):
+    """Оставляет в queryset постов только совпавшие с запросом."""
+    match = match_expression(query)
+    if match is None:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [match]
+    ))
@@ -0,0 +1,44 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+CARD_TEMPLATE = 'includes/post_item.html'
+
+
+def card_key(post, user):
+    # Автору карточка рисуется с кнопкой «Редактировать», остальным - без.
+    is_author = int(user is not None and user.pk == post.author_id)
+    return f'post_card:{post.pk}:{post.updated.timestamp()}:{is_author}'
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Рисует карточки постов, беря готовый HTML из кеша одним get_many.
+
+    Ключ включает ``post.updated``, поэтому правка поста и новый
+    комментарий сразу дают новую карточку.
+    """
+    user = context.get('user')
+    posts = list(posts)
+    keys = [card_key(post, user) for post in posts]
+    cards = cache.get_many(keys)
+    # Варианты картинок нужны только карточкам, которых нет в кеше.
+    prefetch_related_objects(
+        [post for key, post in zip(keys, posts)
+         if key not in cards and post.image],
+        'image_variants'
+    )
+    missing = {}
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            cards[key] = missing[key] = render_to_string(
+                CARD_TEMPLATE, {'post': post, 'user': user}
+            )
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+    return mark_safe(''.join(cards[key] for key in keys))
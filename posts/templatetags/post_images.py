@@ -0,0 +1,20 @@
+from django import template
+
+from .. import images, thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, size='card'):
+    """Готовая миниатюра картинки или None, если она еще строится."""
+    return thumbnails.lookup(image, size)
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(post):
+    """Картинка поста: ``<picture>`` с вариантами или одна миниатюра."""
+    return {
+        'post': post,
+        'sources': images.sources(post) if post.image else None,
+    }
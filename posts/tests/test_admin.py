@@ -0,0 +1,217 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.admin import site
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import moderation
+from posts.admin import CommentAdmin, FollowAdmin
+from posts.models import (Comment, Follow, Group, ImageVariant,
+                          ModerationJob, Post, UserStats)
+
+User = get_user_model()
+
+CHANGELISTS = ('admin:posts_post_changelist',
+               'admin:posts_comment_changelist',
+               'admin:posts_follow_changelist')
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.group = Group.objects.create(title='Группа', slug='group')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        start = User.objects.count()
+        users = [User.objects.create(username=f'user{start + i}')
+                 for i in range(count)]
+        for user in users:
+            post = Post.objects.create(text='Текст', author=user,
+                                       group=self.group)
+            Comment.objects.create(post=post, author=user, text='Ответ')
+            Follow.objects.create(user=user, author=self.admin)
+
+    def queries(self, url, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse(url), params)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in context.captured_queries]
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов списка не зависит от числа строк на странице."""
+        self.add_rows(3)
+        few = {url: len(self.queries(url)) for url in CHANGELISTS}
+        self.add_rows(20)
+        for url in CHANGELISTS:
+            with self.subTest(url=url):
+                self.assertEqual(len(self.queries(url)), few[url])
+
+    def test_estimated_count(self):
+        """Без фильтров список не делает COUNT(*), с фильтром - считает."""
+        self.add_rows(3)
+        with mock.patch('posts.admin.ESTIMATE_THRESHOLD', 1):
+            sql = self.queries('admin:posts_comment_changelist')
+            self.assertFalse(any('COUNT(*)' in query for query in sql))
+            sql = self.queries('admin:posts_comment_changelist',
+                               q='user1')
+            self.assertTrue(any('COUNT(*)' in query for query in sql))
+        response = self.client.get(
+            reverse('admin:posts_follow_changelist'), {'q': 'user1'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_username_search_uses_indexes(self):
+        """Поиск по имени идет по индексам, без полного прохода таблицы."""
+        self.add_rows(2)
+        for url, model_admin in (
+            ('admin:posts_comment_changelist', CommentAdmin(Comment, site)),
+            ('admin:posts_follow_changelist', FollowAdmin(Follow, site)),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(reverse(url), {'q': 'user1'})
+                self.assertEqual(response.context['cl'].result_count, 1)
+                queryset, _ = model_admin.get_search_results(
+                    None, model_admin.model.objects.all(), 'user1'
+                )
+                self.assertNotIn('SCAN', queryset.explain())
+
+
+@mock.patch('posts.moderation.CHUNK_SIZE', 2)
+class ModerationJobTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.spammer = User.objects.create(username='spammer')
+        cls.reader = User.objects.create(username='reader')
+        cls.old = Group.objects.create(title='Старая', slug='old')
+        cls.new = Group.objects.create(title='Новая', slug='new')
+        Follow.objects.create(user=cls.reader, author=cls.spammer)
+        for i in range(5):
+            post = Post.objects.create(text=f'Спам {i}', author=cls.spammer,
+                                       group=cls.old)
+            Comment.objects.create(post=post, author=cls.reader, text='Ой')
+        cls.post = Post.objects.create(text='Нормальный пост',
+                                       author=cls.reader, group=cls.old)
+        for i in range(3):
+            Comment.objects.create(post=cls.post, author=cls.spammer,
+                                   text=f'Купите {i}')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def action(self, model, action, queryset, **data):
+        return self.client.post(
+            reverse(f'admin:posts_{model}_changelist'),
+            {'action': action, '_selected_action': [
+                obj.pk for obj in queryset
+            ], **data},
+        )
+
+    def run_job(self):
+        job = ModerationJob.objects.get()
+        return moderation.run(job.pk)
+
+    def test_reassign_group(self):
+        """Перенос подтверждается формой и идет пачками."""
+        posts = Post.objects.filter(author=self.spammer)
+        response = self.action('post', 'reassign_group', posts)
+        self.assertTemplateUsed(response,
+                                'admin/posts/moderation_confirm.html')
+        self.assertFalse(ModerationJob.objects.exists())
+
+        self.action('post', 'reassign_group', posts,
+                    apply='yes', group=self.new.pk)
+        job = self.run_job()
+        self.assertEqual(job.status, ModerationJob.DONE)
+        self.assertEqual((job.processed, job.total), (5, 5))
+        self.assertEqual(Post.objects.filter(group=self.new).count(), 5)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).group, self.old)
+        response = self.client.get(
+            reverse('admin:posts_moderationjob_changelist')
+        )
+        self.assertContains(response, '5 / 5')
+
+    def test_delete_posts_by_author(self):
+        """Удаляются все посты автора с комментариями и лентами."""
+        self.action('post', 'delete_authors_posts',
+                    Post.objects.filter(author=self.spammer)[:1],
+                    apply='yes')
+        job = self.run_job()
+        self.assertEqual((job.status, job.processed),
+                         (ModerationJob.DONE, 5))
+        self.assertFalse(Post.objects.filter(author=self.spammer).exists())
+        self.assertFalse(self.reader.timeline.exists())
+        self.assertEqual(Comment.objects.filter(author=self.reader).count(),
+                         0)
+        self.assertEqual(UserStats.objects.get(user=self.spammer)
+                         .posts_count, 0)
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+
+    def test_delete_posts_removes_variant_files(self):
+        """Файлы вариантов картинок удаляются вместе с постами."""
+        media = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media):
+            variant = ImageVariant(
+                post=Post.objects.filter(author=self.spammer).first(),
+                format='webp', width=10, height=10,
+            )
+            variant.file.save('spam.webp', ContentFile(b'webp'))
+            self.action('post', 'delete_authors_posts',
+                        Post.objects.filter(author=self.spammer)[:1],
+                        apply='yes')
+            # TestCase не коммитит: колбэки on_commit вызываются сразу.
+            with mock.patch.object(moderation.transaction, 'on_commit',
+                                   lambda callback: callback()):
+                self.run_job()
+            self.assertFalse(os.path.exists(variant.file.path))
+
+    def test_delete_comments_by_author(self):
+        """Комментарии автора уходят, счетчик поста пересчитан."""
+        self.action('comment', 'delete_authors_comments',
+                    Comment.objects.filter(author=self.spammer)[:1],
+                    apply='yes')
+        self.run_job()
+        self.assertFalse(Comment.objects.filter(author=self.spammer)
+                         .exists())
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comments_count,
+                         0)
+
+    def test_resume(self):
+        """Прерванное задание продолжается с первой незаконченной пачки."""
+        ids = list(Post.objects.filter(author=self.spammer)
+                   .order_by('pk').values_list('pk', flat=True))
+        ModerationJob.objects.create(
+            action=ModerationJob.REASSIGN_GROUP, group=self.new,
+            post_ids=','.join(map(str, ids)), total=len(ids), processed=2,
+            status=ModerationJob.RUNNING,
+        )
+        call_command('run_moderation_jobs', stdout=StringIO())
+        self.assertEqual(ModerationJob.objects.get().status,
+                         ModerationJob.RUNNING)
+        call_command('run_moderation_jobs', resume=True, stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.filter(group=self.new).order_by('pk')
+                 .values_list('pk', flat=True)),
+            ids[2:]
+        )
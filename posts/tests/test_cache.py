@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from yatube.sqlite_cache import SQLiteCache
+
+
+def _incr_many(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_get_set_delete(self):
+        """Значения переживают pickle, удаление и истечение срока."""
+        self.cache.set('post', {'id': 1, 'text': 'Текст'})
+        self.assertEqual(self.cache.get('post'), {'id': 1, 'text': 'Текст'})
+        self.cache.delete('post')
+        self.assertIsNone(self.cache.get('post'))
+        self.cache.set('expired', 1, timeout=-1)
+        self.assertFalse(self.cache.has_key('expired'))
+
+    def test_add_and_get_many(self):
+        """add не перезаписывает живой ключ, get_many берет пачку разом."""
+        self.assertTrue(self.cache.add('key', 'first'))
+        self.assertFalse(self.cache.add('key', 'second'))
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(
+            self.cache.get_many(['key', 'a', 'b', 'missing']),
+            {'key': 'first', 'a': 1, 'b': 2}
+        )
+
+    def test_incr_non_integer_keeps_key(self):
+        """incr не целого числа пишет в тот же ключ."""
+        self.cache.set('float', 1.5)
+        self.assertEqual(self.cache.incr('float'), 2.5)
+        self.assertEqual(self.cache.get('float'), 2.5)
+        count = self.cache._db.execute(
+            'SELECT COUNT(*) FROM cache').fetchone()[0]
+        self.assertEqual(count, 1)
+
+    def test_get_many_marks_access(self):
+        """get_many отмечает время обращения, как и get."""
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.cache._db.execute("UPDATE cache SET accessed = accessed - 3600")
+        self.cache.get_many(['a'])
+        accessed = dict(self.cache._db.execute(
+            'SELECT key, accessed FROM cache').fetchall())
+        self.assertGreater(accessed[self.cache.make_key('a')],
+                           accessed[self.cache.make_key('b')] + 3000)
+
+    def test_incr_is_shared_between_processes(self):
+        """incr атомарен и виден всем процессам."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=_incr_many, args=(self.location, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_cull_evicts_least_recently_used(self):
+        """При переполнении вытесняются давно не читанные ключи."""
+        cache = SQLiteCache(self.location, {'OPTIONS': {'MAX_ENTRIES': 10}})
+        cache.set('hot', 'value')
+        # Ключ только что читали: время обращения новее, чем у остальных.
+        cache._db.execute("UPDATE cache SET accessed = accessed + 3600")
+        for i in range(60):
+            cache.set(f'cold_{i}', i)
+        self.assertEqual(cache.get('hot'), 'value')
+        self.assertIsNone(cache.get('cold_0'))
+        count = cache._db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        self.assertLess(count, 61)
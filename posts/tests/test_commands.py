@@ -0,0 +1,253 @@
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import recommendations
+from posts.management.commands.check_query_plans import (explain,
+                                                         problems,
+                                                         view_queries)
+from posts.models import (Comment, Follow, Post, Recommendation,
+                          TimelineEntry, UserStats)
+
+
+class QueryPlanTest(TestCase):
+    def test_feed_queries_use_indexes(self):
+        """Запросы страниц идут по индексам и без временной сортировки."""
+        checked = view_queries()
+        sql = '\n'.join(query for _, query in checked)
+        self.assertIn('LIMIT 11', sql)
+        self.assertNotIn('COUNT(*)', sql)
+        self.assertIn('MAX(', sql)
+        for name, query in checked:
+            with self.subTest(name=name, sql=query):
+                self.assertEqual(list(problems(explain(query))), [])
+        self.assertFalse(get_user_model().objects.filter(
+            username='query-plan-sample').exists())
+
+
+class RebuildTimelinesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.reader = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author) for i in range(3)
+        )
+        Follow.objects.bulk_create([
+            Follow(user=cls.reader, author=cls.author)
+        ])
+
+    def test_rebuild_timelines(self):
+        """Команда заполняет ленты для подписок, созданных мимо сигналов."""
+        self.assertFalse(TimelineEntry.objects.exists())
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            set(self.reader.timeline.values_list('post_id', flat=True)),
+            set(self.author.posts.values_list('id', flat=True))
+        )
+
+
+class ReconcileCountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.reader = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_counters_follow_signals(self):
+        """Счетчики меняются при создании и удалении постов и подписок."""
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertEqual(self.reader.stats.following_count, 1)
+        Follow.objects.filter(user=self.reader).delete()
+        self.reader.stats.refresh_from_db()
+        self.assertEqual(self.reader.stats.following_count, 0)
+
+    def test_reconcile_counters_repairs_drift(self):
+        """Команда reconcile_counters чинит разошедшиеся счетчики."""
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        Post.objects.filter(pk=self.post.pk).update(comments_count=7)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        self.author.stats.refresh_from_db()
+        self.post.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(self.post.comments_count, 0)
+
+
+class RecommendationsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.reader, cls.friend, cls.author, cls.other = (
+            User.objects.create(username=name)
+            for name in ('reader', 'friend', 'author', 'other')
+        )
+        Follow.objects.bulk_create([
+            Follow(user=cls.reader, author=cls.friend),
+            Follow(user=cls.friend, author=cls.author),
+            Follow(user=cls.other, author=cls.friend),
+            Follow(user=cls.other, author=cls.author),
+        ])
+
+    def test_compute_recommendations(self):
+        """Друзья друзей попадают в рекомендации, свои подписки - нет."""
+        call_command('compute_recommendations', stdout=StringIO())
+        self.assertEqual(
+            list(self.reader.recommendations.order_by('rank')
+                 .values_list('candidate__username', flat=True)),
+            ['author']
+        )
+        self.assertFalse(
+            Recommendation.objects.filter(user=self.other).exists()
+        )
+
+    def test_followers_sample_takes_recent(self):
+        """У популярного автора учитываются последние подписчики."""
+        User = get_user_model()
+        newcomer = User.objects.create(username='newcomer')
+        fresh = User.objects.create(username='fresh')
+        Follow.objects.create(user=newcomer, author=self.friend)
+        Follow.objects.create(user=newcomer, author=fresh)
+        with mock.patch('posts.recommendations.FOLLOWERS_SAMPLE', 1):
+            scores = recommendations.scores_for(
+                self.reader.pk, *recommendations.load_graph()
+            )
+        self.assertIn(fresh.pk, scores)
+
+    def test_recommendations_block(self):
+        """Блок на странице подписок, подписка убирает кандидата."""
+        call_command('compute_recommendations', stdout=StringIO())
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('follow_index'))
+        self.assertEqual(
+            [item.candidate for item in response.context['recommendations']],
+            [self.author]
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = client.get(reverse('follow_index'))
+        self.assertEqual(response.context['recommendations'], [])
+
+
+class SeedDataTest(TestCase):
+    def test_seed_data(self):
+        """Сидер создает данные и пересобирает ленты и счетчики."""
+        media = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media):
+            call_command('seed_data', users=5, groups=2, posts=30,
+                         comments=20, follows=10, images=1, days=10,
+                         stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 1
+        )
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=follow.user).count(),
+            Post.objects.filter(
+                author__following__user=follow.user
+            ).count()
+        )
+        for stats in UserStats.objects.all():
+            self.assertEqual(stats.posts_count,
+                             Post.objects.filter(author=stats.user).count())
+
+
+class ImportContentTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        Image.new('RGB', (40, 30), 'red').save(
+            os.path.join(self.directory, 'red.jpg')
+        )
+        self.posts = os.path.join(self.directory, 'posts.jsonl')
+        with open(self.posts, 'w', encoding='utf-8') as file_:
+            for i in range(5):
+                file_.write(json.dumps({
+                    'id': i, 'author': 'leo', 'group': 'cats',
+                    'text': f'Пост {i}', 'pub_date': '2020-01-02T03:04:05',
+                    'image': 'red.jpg' if i == 0 else '',
+                }) + '\n')
+            file_.write(json.dumps({'id': 9, 'author': 'nobody'}) + '\n')
+        self.comments = os.path.join(self.directory, 'comments.csv')
+        with open(self.comments, 'w', encoding='utf-8') as file_:
+            file_.write('post,author,text,created\n0,leo,Первый,\n'
+                        '0,leo,Второй,\n404,leo,Без поста,\n')
+
+    def call(self, *args, **options):
+        with override_settings(MEDIA_ROOT=self.directory):
+            call_command('import_content', *args, batch_size=2,
+                         images_dir=self.directory, stdout=StringIO(),
+                         stderr=StringIO(), **options)
+
+    def test_import_content(self):
+        """Импорт создает авторов и группы, копирует картинки, чинит счетчики."""
+        self.call('posts', self.posts, create_missing=True)
+        self.call('comments', self.comments)
+        self.assertEqual(Post.objects.count(), 5)
+        post = Post.objects.get(source_id='0')
+        self.assertEqual(post.group.slug, 'cats')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.image_width, 40)
+        self.assertTrue(
+            os.path.exists(os.path.join(self.directory, post.image.name))
+        )
+        self.assertEqual(post.comments_count, 2)
+        self.assertEqual(post.author.stats.posts_count, 5)
+
+    def test_resume(self):
+        """Повторный запуск продолжает с контрольной точки, без дублей."""
+        self.call('posts', self.posts, create_missing=True)
+        self.call('posts', self.posts)
+        self.assertEqual(Post.objects.count(), 5)
+        # Без контрольной точки дубли отсекает source_id.
+        self.call('posts', self.posts, restart=True)
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_resume_after_commit_before_checkpoint(self):
+        """Пачка, закоммиченная без контрольной точки, не грузится снова."""
+        self.call('posts', self.posts, create_missing=True)
+        self.call('comments', self.comments)
+        # Сбой после коммита пачки со второй строки: точка осталась на первой.
+        with open(f'{self.comments}.checkpoint', 'w') as file_:
+            json.dump({'rows': 1}, file_)
+        self.call('comments', self.comments)
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_rolled_back_batch_removes_images(self):
+        """Картинки откаченной пачки не остаются в MEDIA_ROOT."""
+        with mock.patch.object(Post.objects, 'bulk_create',
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.call('posts', self.posts, create_missing=True)
+        self.assertEqual(os.listdir(os.path.join(self.directory, 'posts')),
+                         [])
+
+    def test_export_round_trip(self):
+        """В архиве поля и пути картинок те же, что читает import_content."""
+        self.call('posts', self.posts, create_missing=True)
+        exported = os.path.join(self.directory, 'export.zip')
+        with override_settings(MEDIA_ROOT=self.directory):
+            call_command('export_user_data', 'leo', format='zip',
+                         output=exported)
+        with zipfile.ZipFile(exported) as archive:
+            self.assertIn(Post.objects.get(source_id='0').image.name,
+                          archive.namelist())
+            lines = archive.read('posts.jsonl').decode().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[0])['author'], 'leo')
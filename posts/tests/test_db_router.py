@@ -0,0 +1,61 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from posts.models import Post
+from yatube import db_router
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = db_router.PrimaryReplicaRouter()
+
+    def route(self, request, write=False):
+        """Прогоняет запрос через middleware и запоминает, куда шли чтения."""
+        reads = {}
+
+        def view(request):
+            reads['post'] = self.router.db_for_read(Post)
+            reads['user'] = self.router.db_for_read(User)
+            if write:
+                self.router.db_for_write(Post)
+                reads['after_write'] = self.router.db_for_read(Post)
+            return HttpResponse()
+
+        response = db_router.ReplicaRoutingMiddleware(view)(request)
+        return reads, response
+
+    def test_outside_request(self):
+        """Команды и фоновые потоки читают основную базу."""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_get_reads_replica(self):
+        reads, response = self.route(self.factory.get('/'))
+        self.assertEqual(reads, {'post': 'replica', 'user': 'default'})
+        self.assertNotIn(db_router.STICKY_COOKIE, response.cookies)
+
+    def test_write_sticks_to_primary(self):
+        """После записи чтения и следующие запросы идут в основную базу."""
+        reads, response = self.route(self.factory.get('/'), write=True)
+        self.assertEqual(reads['after_write'], 'default')
+        cookie = response.cookies[db_router.STICKY_COOKIE]
+        self.assertGreater(float(cookie.value), time.time())
+
+        request = self.factory.get('/')
+        request.COOKIES[db_router.STICKY_COOKIE] = cookie.value
+        reads, _ = self.route(request)
+        self.assertEqual(reads['post'], 'default')
+
+    def test_post_and_expired_cookie(self):
+        reads, _ = self.route(self.factory.post('/'))
+        self.assertEqual(reads['post'], 'default')
+        request = self.factory.get('/')
+        request.COOKIES[db_router.STICKY_COOKIE] = str(time.time() - 1)
+        reads, _ = self.route(request)
+        self.assertEqual(reads['post'], 'replica')
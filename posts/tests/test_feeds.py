@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+
+class AtomFeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = get_user_model().objects.create(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(text='В группе', author=cls.author,
+                                       group=cls.group)
+        Post.objects.create(text='Без группы', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds(self):
+        """Ленты сайта, группы и автора отдают свои посты в Atom."""
+        cases = (
+            (reverse('index_feed'), 2),
+            (reverse('group_feed', args=['group']), 1),
+            (reverse('author_feed', args=['author']), 2),
+        )
+        for url, count in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response['Content-Type'],
+                                 'application/atom+xml; charset=utf-8')
+                self.assertEqual(response.content.count(b'<entry>'), count)
+
+    def test_conditional_poll(self):
+        """Повторный опрос получает 304, правка поста меняет ETag."""
+        url = reverse('group_feed', args=['group'])
+        response = self.client.get(url)
+        etag = response['ETag']
+        for headers in ({'HTTP_IF_NONE_MATCH': etag},
+                        {'HTTP_IF_MODIFIED_SINCE':
+                         response['Last-Modified']}):
+            with self.subTest(headers=headers):
+                self.assertEqual(
+                    self.client.get(url, **headers).status_code, 304
+                )
+
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправлено'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Исправлено', response.content.decode())
+
+    def test_unknown_group(self):
+        response = self.client.get(reverse('group_feed', args=['missing']))
+        self.assertEqual(response.status_code, 404)
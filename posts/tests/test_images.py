@@ -0,0 +1,91 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import images
+from posts.forms import PostForm
+from posts.models import Post
+from posts.templatetags.post_images import post_image
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def jpeg_with_exif(size=(40, 20)):
+    exif = Image.Exif()
+    exif[0x0112] = 6  # повернуть на 90 градусов
+    exif[0x010F] = 'Camera'
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImagePipelineTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_strip_metadata(self):
+        """Загрузка теряет EXIF, но сохраняет ориентацию."""
+        cleaned = Image.open(images.strip_metadata(jpeg_with_exif()))
+        self.assertEqual(cleaned.size, (20, 40))
+        self.assertEqual(dict(cleaned.getexif()), {})
+
+    def test_variants_rendered_as_picture(self):
+        """Варианты строятся по всем ширинам и форматам и идут в srcset."""
+        author = get_user_model().objects.create(username='author')
+        post = Post.objects.create(text='Фото', author=author,
+                                   image=jpeg_with_exif((1200, 800)))
+        images.build_variants(post)
+        self.assertEqual(post.image_variants.count(),
+                         len(images.WIDTHS) * len(images.FORMATS))
+
+        context = post_image(post)
+        self.assertEqual([source['type'] for source in context['sources']],
+                         ['image/webp', 'image/jpeg'])
+        for source in context['sources']:
+            self.assertEqual(source['srcset'].count('w,'),
+                             len(images.WIDTHS) - 1)
+
+        images.build_variants(post)
+        self.assertEqual(post.image_variants.count(),
+                         len(images.WIDTHS) * len(images.FORMATS))
+
+    def test_edit_drops_old_variants(self):
+        """Смена и удаление картинки сразу убирают ее варианты."""
+        author = get_user_model().objects.create(username='author')
+        post = Post.objects.create(text='Фото', author=author,
+                                   image=jpeg_with_exif((1200, 800)))
+        client = Client()
+        client.force_login(author)
+        url = reverse('post_edit', kwargs={'username': 'author',
+                                           'post_id': post.pk})
+        for data in ({'image': jpeg_with_exif()}, {'image-clear': 'on'}):
+            images.build_variants(post)
+            client.post(url, {'text': 'Фото', **data})
+            self.assertFalse(post.image_variants.exists())
+        post.refresh_from_db()
+        self.assertFalse(post.image)
+
+    def test_form_stores_image_metadata(self):
+        """Форма сохраняет размеры, вес и превью вместе с картинкой."""
+        author = get_user_model().objects.create(username='author')
+        form = PostForm({'text': 'Фото'},
+                        files={'image': jpeg_with_exif((40, 20))},
+                        instance=Post(author=author))
+        self.assertTrue(form.is_valid())
+        post = form.save()
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (20, 40))
+        self.assertEqual(post.image_size, post.image.size)
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
@@ -0,0 +1,182 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import (Client, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+
+from posts import bulk, images
+from posts.models import Comment, Follow, Group, Post
+from yatube.instrumentation import budget_for
+
+User = get_user_model()
+
+# Каждая именованная страница posts, users и about: аргументы URL, метод и
+# нужен ли вход. Новая страница без строки здесь роняет test_all_pages_listed.
+PAGES = {
+    'index': ((), 'get', False),
+    'group': (('slug',), 'get', False),
+    'group_feed': (('slug',), 'get', False),
+    'index_feed': ((), 'get', False),
+    'author_feed': (('username',), 'get', False),
+    'search': ((), 'get', False),
+    'export': ((), 'get', True),
+    'profile': (('username',), 'get', True),
+    'post': (('username', 'post_id'), 'get', True),
+    'post_comments': (('username', 'post_id'), 'get', False),
+    'post_edit': (('username', 'post_id'), 'get', 'author'),
+    'new_post': ((), 'get', True),
+    'add_comment': (('username', 'post_id'), 'post', True),
+    'follow_index': ((), 'get', True),
+    'profile_follow': (('username',), 'get', True),
+    'profile_unfollow': (('username',), 'get', True),
+    '404': ((), 'get', False),
+    '500': ((), 'get', False),
+    'signup': ((), 'get', False),
+    'about:author': ((), 'get', False),
+    'about:tech': ((), 'get', False),
+}
+URLCONFS = {'posts.urls': '', 'users.urls': '', 'about.urls': 'about:'}
+
+
+def seed(**options):
+    call_command('seed_data', stdout=StringIO(), images=1, image_share=0.05,
+                 days=30, **options)
+    call_command('pregenerate_thumbnails', stdout=StringIO())
+
+
+class PagesListedTest(SimpleTestCase):
+    def test_all_pages_listed(self):
+        """Бюджет проверяется для каждой именованной страницы."""
+        names = {
+            prefix + name
+            for urlconf, prefix in URLCONFS.items()
+            for name in get_resolver(urlconf).reverse_dict
+            if isinstance(name, str)
+        }
+        self.assertEqual(names, set(PAGES))
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class PerformanceBudgetTest(TestCase):
+    """Число SQL-запросов и время каждой страницы на холодном кеше.
+
+    Страницы меряются дважды: когда ленты и комментарии только заполнили
+    страницу и когда данных стало на порядок больше. Число запросов не
+    должно расти вместе с данными и не должно выходить за бюджет из
+    ``PERFORMANCE_BUDGETS``. Метрики берутся из лога ``yatube.requests``,
+    то есть считаются так же, как в бою.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._media_root = settings.MEDIA_ROOT
+        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        settings.MEDIA_ROOT = cls._media_root
+        super().tearDownClass()
+
+    def setUp(self):
+        seed(users=10, groups=2, posts=20, comments=10, follows=20)
+        self.author = (
+            User.objects.annotate(total=Count('posts'))
+            .filter(total__gt=0).order_by('-total', 'pk').first()
+        )
+        self.viewer = User.objects.exclude(pk=self.author.pk).first()
+        Follow.objects.get_or_create(user=self.viewer, author=self.author)
+        self.post = self.author.posts.order_by('-pub_date').first()
+        self.group = Group.objects.order_by('pk').first()
+
+    def grow(self, **volume):
+        """Добавляет данных, в том числе автору и его посту.
+
+        После первого же вызова все ленты и списки комментариев заполняют
+        страницу целиком, а на первой странице лент есть картинки.
+        """
+        seed(**volume)
+        image = Post.objects.exclude(image='').values_list(
+            'image', flat=True).first()
+        # Свежее всех сгенерированных: окажутся на первых страницах.
+        now = timezone.now()
+        with bulk.explicit_dates(Post, 'pub_date', 'updated'):
+            Post.objects.bulk_create(
+                Post(text=f'Пост {i}', author=self.author,
+                     group=self.group, image=image,
+                     pub_date=now, updated=now)
+                for i in range(30)
+            )
+        for post in Post.objects.filter(author=self.author, pub_date=now):
+            images.build_variants(post)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.viewer, text=f'Ответ {i}')
+            for i in range(50)
+        )
+        bulk.finish()
+
+    def url(self, name):
+        keys, _, _ = PAGES[name]
+        values = {
+            'slug': self.group.slug,
+            'username': self.author.username,
+            'post_id': self.post.pk,
+        }
+        return reverse(name, kwargs={key: values[key] for key in keys})
+
+    def client_for(self, login):
+        client = Client(raise_request_exception=False)
+        if login == 'author':
+            client.force_login(self.author)
+        elif login:
+            client.force_login(self.viewer)
+        return client
+
+    def measure(self, name):
+        """Метрики запроса к странице из лога yatube.requests."""
+        _, method, login = PAGES[name]
+        client = self.client_for(login)
+        url = self.url(name)
+        data = {'q': 'пост'} if name == 'search' else {}
+        if name == 'add_comment':
+            data = {'text': 'Комментарий'}
+        cache.clear()
+        with self.assertLogs('yatube.requests', 'INFO') as logs:
+            getattr(client, method)(url, data)
+        return json.loads(logs.records[-1].getMessage())
+
+    def measure_all(self):
+        return {name: self.measure(name) for name in PAGES}
+
+    def test_budgets(self):
+        """Запросов не больше бюджета, и их число не растет с данными."""
+        self.grow(users=20, groups=2, posts=100, comments=200, follows=50)
+        medium = self.measure_all()
+        self.grow(users=100, groups=5, posts=1000, comments=3000,
+                  follows=500)
+        large = self.measure_all()
+        for name in PAGES:
+            with self.subTest(page=name):
+                budget = budget_for(name)
+                self.assertEqual(
+                    large[name]['queries'], medium[name]['queries'],
+                    f'{self.url(name)}: число запросов зависит от данных'
+                )
+                self.assertLessEqual(
+                    large[name]['queries'], budget['queries'],
+                    f'{self.url(name)}: запросов больше бюджета'
+                )
+                self.assertLessEqual(
+                    large[name]['ms'], budget['ms'],
+                    f'{self.url(name)}: страница дольше бюджета'
+                )
@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.author = User.objects.create(username='author')
+        cls.admin = User.objects.create_superuser('admin', '', 'password')
+        cls.hedgehog = Post.objects.create(
+            text='Ёжик в тумане', author=cls.author
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Туманное утро {i}', author=cls.author)
+            for i in range(12)
+        )
+
+    def test_search_page(self):
+        """Поиск по префиксам слов, без учета регистра и «ё»."""
+        response = Client().get(reverse('search'), {'q': 'ежик ТУМАН'})
+        self.assertEqual([post.pk for post in response.context['page']],
+                         [self.hedgehog.pk])
+
+    def test_search_cursor_keeps_query(self):
+        """Следующая страница выдачи идет по курсору и помнит запрос."""
+        client = Client()
+        response = client.get(reverse('search'), {'q': 'туман'})
+        page = response.context['page']
+        self.assertTrue(page.has_next())
+        self.assertContains(response, f'?q=%D1%82%D1%83%D0%BC%D0%B0%D0%BD'
+                                      f'&amp;after={page.next_cursor}')
+        response = client.get(reverse('search'),
+                              {'q': 'туман', 'after': page.next_cursor})
+        seen = set(page) | set(response.context['page'])
+        self.assertEqual(len(seen), 13)
+
+    def test_index_follows_edits_and_deletes(self):
+        """Триггеры держат индекс в актуальном состоянии."""
+        post = Post.objects.get(pk=self.hedgehog.pk)
+        post.text = 'Медвежонок'
+        post.save()
+        found = search.filter_queryset(Post.objects.all(), 'медвеж')
+        self.assertEqual(list(found), [post])
+        post.delete()
+        self.assertFalse(search.filter_queryset(Post.objects.all(), 'медвеж'))
+
+    def test_admin_search(self):
+        """Поиск в админке идет через индекс FTS5."""
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'ёжик'})
+        self.assertEqual(
+            [post.pk for post in response.context['cl'].result_list],
+            [self.hedgehog.pk]
+        )
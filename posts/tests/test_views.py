@@ -1,16 +1,30 @@
+import csv
+import io
+import json
 import shutil
 import tempfile
+import zipfile
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from posts import caching, thumbnails
 from posts.models import Comment, Group, Post
+from posts.pagination import encode_cursor
+from yatube import instrumentation
 
 
+# Миниатюры строятся прямо в запросе: фоновые потоки сделали бы ETag и
+# ключи карточек зависящими от того, успел ли воркер.
+@override_settings(THUMBNAIL_WORKERS=0)
 class PostViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):        
@@ -30,7 +44,7 @@ class PostViewsTest(TestCase):
             slug='test_slug_1',
         )
 
-        small_gif = (
+        cls.small_gif = small_gif = (
             b'\x47\x49\x46\x38\x39\x61\x02\x00'
             b'\x01\x00\x80\x00\x00\x00\x00\x00'
             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
@@ -122,8 +136,9 @@ class PostViewsTest(TestCase):
         }
     )  
     def test_second_page_of_index(self):
-        """Проверка второй страницы шаблона index."""
-        response = self.client.get(reverse('index') + '?page=2')
+        """Старая ссылка на вторую страницу index ведет на курсор."""
+        response = self.client.get(reverse('index') + '?page=2', follow=True)
+        self.assertIn('after=', response.redirect_chain[0][0])
         self.assertEqual(
             response.context.get('page').object_list,
             list(Post.objects.all()[10:20])
@@ -236,12 +251,42 @@ class PostViewsTest(TestCase):
     def test_cache_index_page(self):
         """Тестируем cache"""
         index_1 = self.client.get(reverse('index'))
+        # update() идет мимо сигналов: версия ленты не меняется,
+        # страница должна прийти из кеша.
+        Post.objects.update(text='Изменено мимо сигналов')
+        index_2 = self.client.get(reverse('index'))
+        self.assertHTMLEqual(str(index_1.content), str(index_2.content))
+
+    def test_cache_index_page_invalidated_by_new_post(self):
+        """Новый пост сразу сбрасывает кеш ленты."""
+        self.client.get(reverse('index'))
         Post.objects.create(
             text='Test-cache',
             author=PostViewsTest.user
         )
-        index_2 = self.client.get(reverse('index'))
-        self.assertHTMLEqual(str(index_1.content), str(index_2.content))
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Test-cache')
+
+    def test_cache_index_page_is_page_aware(self):
+        """Вторая страница не отдается из кеша первой."""
+        self.client.get(reverse('index'))
+        response = self.client.get(reverse('index'), {'page': 2},
+                                   follow=True)
+        for post in Post.objects.all()[10:20]:
+            with self.subTest(post=post):
+                self.assertContains(response, f'name="post_{post.id}"')
+
+    def test_author_sees_own_post_after_new_post(self):
+        """Автор сразу видит свой пост, даже если версия в кеше отстала."""
+        self.authorized_client.get(reverse('index'))
+        stale_version = caching.feed_version()
+        self.authorized_client.post(
+            reverse('new_post'), {'text': 'Мой свежий пост'}
+        )
+        # Воркер со своим кешем еще не видел увеличения версии.
+        cache.set(caching.FEED_VERSION_KEY, stale_version)
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, 'Мой свежий пост')
 
     def test_profile_follow(self):
         """authorized_client может подписываться"""
@@ -318,3 +363,275 @@ class PostViewsTest(TestCase):
         )
         self.assertEqual(response.status_code, 200)
         self.assertEqual(Comment.objects.count(), 0)
+
+    @override_settings(
+        CACHES = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+            }
+        }
+    )
+    def test_cursor_pages_follow_numbered_pages(self):
+        """Первая страница ведет дальше по курсору, без номеров страниц."""
+        first = self.client.get(reverse('index'))
+        last = first.context.get('page').object_list[-1]
+        cursor = encode_cursor(last.pub_date, last.id)
+        self.assertContains(first, f'?after={cursor}')
+        self.assertNotContains(first, '?page=')
+        second = self.client.get(reverse('index'), {'after': cursor})
+        page = second.context.get('page')
+        self.assertTrue(page.is_cursor)
+        self.assertEqual(
+            page.object_list,
+            list(Post.objects.all()[10:20])
+        )
+        third = self.client.get(reverse('index'), {'after': page.next_cursor})
+        self.assertEqual(
+            third.context.get('page').object_list,
+            list(Post.objects.all()[20:30])
+        )
+        self.assertFalse(third.context.get('page').has_next())
+
+    def test_cursor_is_stable_under_new_posts(self):
+        """Новый пост не сдвигает курсорную страницу."""
+        first = self.client.get(reverse('group', kwargs={'slug': 'test_slug'}))
+        last = first.context.get('page').object_list[-1]
+        cursor = encode_cursor(last.pub_date, last.id)
+        Post.objects.create(
+            text='Свежий пост',
+            author=PostViewsTest.user,
+            group=PostViewsTest.group,
+        )
+        response = self.client.get(
+            reverse('group', kwargs={'slug': 'test_slug'}), {'after': cursor}
+        )
+        self.assertEqual(
+            response.context.get('page').object_list,
+            list(PostViewsTest.group.posts.all()[11:21])
+        )
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор отдает первую страницу."""
+        response = self.client.get(
+            reverse('profile', kwargs={'username': 'testuser'}),
+            {'after': 'garbage!'}
+        )
+        self.assertEqual(
+            response.context.get('page').object_list,
+            list(PostViewsTest.user.posts.all()[:10])
+        )
+
+    @override_settings(
+        CACHES = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+            }
+        }
+    )
+    def test_feed_cards_do_not_query_per_post(self):
+        """Число запросов ленты не зависит от числа карточек."""
+        url = reverse('group', kwargs={'slug': 'test_slug_1'})
+        post = PostViewsTest.group_1.posts.first()
+        Comment.objects.create(post=post, author=self.user, text='Ком')
+        with CaptureQueriesContext(connection) as full_page:
+            response = self.authorized_client.get(url)
+        self.assertContains(response, 'Комментариев: 1')
+        # Первая страница узнает о следующей по лишней строке, без COUNT.
+        self.assertFalse(any('COUNT(*)' in query['sql']
+                             for query in full_page.captured_queries))
+        with CaptureQueriesContext(connection) as last_page:
+            self.authorized_client.get(
+                url, {'after': response.context['page'].next_cursor}
+            )
+        self.assertEqual(len(full_page), len(last_page))
+
+    def test_post_card_cache_versioned_by_edit_and_comment(self):
+        """Карточка берется из кеша, пока пост не правили и не комментировали."""
+        post = PostViewsTest.group_1.posts.first()
+        url = reverse('group', kwargs={'slug': 'test_slug_1'})
+        self.authorized_client.get(url)
+        Post.objects.filter(pk=post.pk).update(text='Мимо сигналов')
+        self.assertNotContains(self.authorized_client.get(url), 'Мимо сигналов')
+
+        self.authorized_client.post(
+            reverse('post_edit', kwargs={'username': 'testuser',
+                                         'post_id': post.pk}),
+            {'text': 'Отредактировано', 'group': PostViewsTest.group_1.pk}
+        )
+        self.assertContains(self.authorized_client.get(url), 'Отредактировано')
+
+        self.authorized_client.post(
+            reverse('add_comment', args=['testuser', post.pk]),
+            {'text': 'Комментарий'}
+        )
+        self.assertContains(
+            self.authorized_client.get(url), 'Комментариев: 1'
+        )
+
+    def test_conditional_get_returns_not_modified(self):
+        """Повторный запрос с тем же ETag получает 304 без рендера."""
+        post = Post.objects.first()
+        urls = (
+            reverse('index'),
+            reverse('group', kwargs={'slug': 'test_slug'}),
+            reverse('profile', kwargs={'username': 'testuser'}),
+            reverse('post', kwargs={'username': 'testuser',
+                                    'post_id': post.id}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                etag = self.authorized_client.get(url)['ETag']
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertIsNone(response.context)
+
+    def test_etag_changes_with_content_and_viewer(self):
+        """ETag меняется при новом комментарии, подписке и смене зрителя."""
+        post = Post.objects.first()
+        post_url = reverse('post', kwargs={'username': 'testuser',
+                                           'post_id': post.id})
+        etag = self.authorized_client.get(post_url)['ETag']
+        self.assertNotEqual(self.guest_client.get(post_url)['ETag'], etag)
+        Comment.objects.create(post=post, author=self.user_1, text='Новый')
+        response = self.authorized_client.get(
+            post_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+        profile_url = reverse('profile', kwargs={'username': 'testuser'})
+        etag = self.authorized_client_1.get(profile_url)['ETag']
+        self.authorized_client_1.get(
+            reverse('profile_follow', kwargs={'username': 'testuser'})
+        )
+        response = self.authorized_client_1.get(
+            profile_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+    @override_settings(THUMBNAIL_WORKERS=1)
+    def test_thumbnail_is_not_built_in_request(self):
+        """Без готовой миниатюры карточка рисует оригинал и ставит очередь."""
+        post = Post.objects.create(
+            text='Свежая картинка', author=self.user,
+            image=SimpleUploadedFile('fresh.gif', self.small_gif, 'image/gif')
+        )
+        url = reverse('post', kwargs={'username': 'testuser',
+                                      'post_id': post.id})
+        with mock.patch.object(thumbnails, 'submit') as submit:
+            response = self.guest_client.get(url)
+        submit.assert_called_once_with(post.pk)
+        self.assertContains(response, f'src="{post.image.url}"')
+
+        thumbnails.generate(post.pk)
+        with mock.patch.object(thumbnails, 'submit') as submit:
+            response = self.guest_client.get(url)
+        submit.assert_not_called()
+        self.assertNotContains(response, f'src="{post.image.url}"')
+        self.assertContains(response, '<source type="image/webp"')
+
+    def test_comments_paged_with_authors(self):
+        """Комментарии идут по порядку порциями, авторы - тем же запросом."""
+        post = Post.objects.first()
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.user_1, text=f'Комментарий {i}')
+            for i in range(25)
+        )
+        url = reverse('post', kwargs={'username': 'testuser',
+                                      'post_id': post.id})
+        response = self.guest_client.get(url)
+        self.assertEqual([item.text for item in response.context['comments']],
+                         [f'Комментарий {i}' for i in range(20)])
+        next_cursor = response.context['comments_next']
+        self.assertIsNotNone(next_cursor)
+
+        fragment = reverse('post_comments', kwargs={'username': 'testuser',
+                                                    'post_id': post.id})
+        with self.assertNumQueries(3):
+            response = self.guest_client.get(fragment, {'after': next_cursor})
+        self.assertEqual(
+            [item.text for item in response.context['comments']],
+            [f'Комментарий {i}' for i in range(20, 25)]
+        )
+        self.assertNotContains(response, 'Показать еще')
+
+    def test_server_timing(self):
+        """Ответ несет метрики запроса, превышение бюджета пишется в лог."""
+        response = self.guest_client.get(reverse('index'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('tpl;dur=', timing)
+        self.assertRegex(timing, r'cache;desc="hits=\d+ misses=\d+"')
+
+        budgets = {'index': {'queries': 0}}
+        with override_settings(PERFORMANCE_BUDGETS=budgets), \
+                self.assertLogs('yatube.requests', 'WARNING') as logs:
+            self.guest_client.get(reverse('index'))
+        self.assertIn('"over_budget": ["queries"]', logs.output[0])
+
+    def test_cache_reads_counted_once(self):
+        """get_many бэкенда без своего get_many не считается дважды."""
+        instrumentation.install()
+        cache.set('hit', 1)
+        metrics = instrumentation.Metrics()
+        token = instrumentation._current.set(metrics)
+        try:
+            cache.get_many(['hit', 'miss_1', 'miss_2'])
+        finally:
+            instrumentation._current.reset(token)
+        self.assertEqual((metrics.cache_hits, metrics.cache_misses), (1, 2))
+
+
+class ExportViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create(username='writer')
+        cls.other = User.objects.create(username='other')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {i}', author=cls.user)
+            for i in range(3)
+        ]
+        Post.objects.create(text='Чужой', author=cls.other)
+        Comment.objects.create(post=cls.posts[0], author=cls.user,
+                               text='Мой комментарий')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_export_formats(self):
+        """Выгрузка идет потоком и содержит только данные пользователя."""
+        response = self.client.get(reverse('export'))
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines],
+            [post.pk for post in self.posts]
+        )
+
+        response = self.client.get(reverse('export'),
+                                   {'format': 'csv', 'kind': 'comments'})
+        rows = list(csv.reader(
+            b''.join(response.streaming_content).decode().splitlines()
+        ))
+        self.assertEqual(rows[0], ['id', 'post', 'author', 'text', 'created'])
+        self.assertEqual(rows[1][3], 'Мой комментарий')
+
+        response = self.client.get(reverse('export'), {'format': 'zip'})
+        self.assertIn('writer.zip', response['Content-Disposition'])
+        archive = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content))
+        )
+        self.assertEqual(archive.namelist(),
+                         ['posts.jsonl', 'comments.jsonl'])
+        self.assertEqual(len(archive.read('posts.jsonl').splitlines()), 3)
+
+    def test_export_requires_login(self):
+        """Гость уходит на вход, неизвестный формат - 400."""
+        response = Client().get(reverse('export'))
+        self.assertEqual(response.status_code, 302)
+        response = self.client.get(reverse('export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,138 @@
+"""Миниатюры постов, которые готовятся заранее в фоне.
+
+Запрос не ждет PIL: шаблон только спрашивает у хранилища sorl готовую
+миниатюру и, если ее нет, ставит генерацию в очередь и рисует исходную
+картинку. Новые картинки уходят в очередь сразу после сохранения поста,
+там же строятся варианты для ``srcset`` (см. ``posts.images``).
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import caching, images
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Все размеры, которые встречаются в шаблонах.
+CARD = ('960x339', {'crop': 'center', 'upscale': True})
+SIZES = {'card': CARD}
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+class _LookupBackend(ThumbnailBackend):
+    def lookup(self, file_, geometry_string, **options):
+        """Как ``get_thumbnail``, но без генерации: None, если не готово."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+_backend = _LookupBackend()
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def generate(post_id):
+    """Готовит миниатюры картинки поста и варианты для srcset."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    for geometry, options in SIZES.values():
+        get_thumbnail(post.image, geometry, **options)
+    if post.image_width is None:
+        # Посты, загруженные до появления этих полей.
+        with post.image.open('rb') as file_:
+            metadata = images.describe(file_)
+        Post.objects.filter(pk=post.pk).update(**metadata)
+    images.build_variants(post)
+
+
+def _refresh(post_id):
+    try:
+        generate(post_id)
+        # Карточки и лента могли закешироваться с исходной картинкой.
+        Post.objects.filter(pk=post_id).update(updated=timezone.now())
+        caching.bump_feed_version()
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры поста %s',
+                         post_id)
+
+
+def _background(post_id):
+    try:
+        _refresh(post_id)
+    finally:
+        with _lock:
+            _pending.discard(post_id)
+        connection.close()
+
+
+def submit(post_id):
+    """Ставит пост в очередь; повторная постановка ничего не делает."""
+    if not settings.THUMBNAIL_WORKERS:
+        _refresh(post_id)
+        return
+    with _lock:
+        if post_id in _pending:
+            return
+        _pending.add(post_id)
+    _pool().submit(_background, post_id)
+
+
+def schedule(post):
+    """Ставит генерацию в очередь после коммита: воркер должен видеть пост."""
+    if post.image:
+        post_id = post.pk
+        transaction.on_commit(lambda: submit(post_id))
+
+
+def lookup(image, size='card'):
+    """Готовая миниатюра или None; на промахе генерация уходит в фон.
+
+    С ``THUMBNAIL_WORKERS = 0`` миниатюра строится прямо в запросе.
+    """
+    if not image:
+        return None
+    geometry, options = SIZES[size]
+    try:
+        if not settings.THUMBNAIL_WORKERS:
+            return get_thumbnail(image, geometry, **options)
+        thumbnail = _backend.lookup(image, geometry, **dict(options))
+    except Exception:
+        # Как и тег ``{% thumbnail %}``: битая картинка не роняет страницу.
+        if thumbnail_settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception('Не удалось получить миниатюру для %s', image)
+        return None
+    if thumbnail is None:
+        submit(image.instance.pk)
+    return thumbnail
@@ -0,0 +1,79 @@
+from django.db import connection
+
+from .models import Follow, Post, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def _insert(entries):
+    # Размер пачки INSERT выбирает сам Django: явный batch_size больше 500
+    # упирается в лимит SQLite на число строк в составном SELECT.
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def _chunks(rows, make_entry):
+    batch = []
+    for row in rows:
+        batch.append(make_entry(row))
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).iterator()
+    for batch in _chunks(followers, lambda user_id: TimelineEntry(
+            user_id=user_id, post_id=post.pk, pub_date=post.pub_date)):
+        _insert(batch)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date').iterator()
+    for batch in _chunks(posts, lambda row: TimelineEntry(
+            user_id=user_id, post_id=row[0], pub_date=row[1])):
+        _insert(batch)
+
+
+def remove(user_id, author_id):
+    """Убирает посты автора из ленты бывшего подписчика."""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__in=Post.objects.filter(author_id=author_id).values('id'),
+    ).delete()
+
+
+def rebuild(user_ids=None):
+    """Пересобирает ленты целиком; возвращает число обработанных подписок.
+
+    Строки ленты вставляются одним INSERT ... SELECT в базе: после
+    массовой загрузки их сотни тысяч, и гонять их через модели долго.
+    """
+    follows = Follow.objects.all()
+    entries = TimelineEntry.objects.all()
+    if user_ids is not None:
+        follows = follows.filter(user_id__in=user_ids)
+        entries = entries.filter(user_id__in=user_ids)
+    entries.delete()
+    where, params = '', []
+    if user_ids is not None:
+        where = f'WHERE f.user_id IN ({", ".join(["%s"] * len(user_ids))})'
+        params = list(user_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            f'(user_id, post_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.pub_date '
+            f'FROM {Follow._meta.db_table} f '
+            f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+            f'{where}',
+            params,
+        )
+    return follows.count()
@@ -1,11 +1,13 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 urlpatterns = [
     path('500/', views.server_error, name='500'),
     path('', views.index, name='index'),
     path('group/<slug:slug>', views.group_posts, name='group'),
+    path('group/<slug:slug>/feed/', feeds.group_feed, name='group_feed'),
+    path('feed/', feeds.index_feed, name='index_feed'),
     path('new/', views.new_post, name='new_post'),
     path('', views.index, name='index'),
     path(
@@ -14,8 +16,16 @@ urlpatterns = [
         name='add_comment'
     ), 
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search_posts, name='search'),
+    path('export/', views.export_data, name='export'),
     path('<str:username>/', views.profile, name='profile'),
+    path('<str:username>/feed/', feeds.author_feed, name='author_feed'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
+    path(
+        '<str:username>/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         '<str:username>/<int:post_id>/edit/', 
         views.post_edit, 
@@ -1,71 +1,140 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
 
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post
+from . import (caching, conditional, export, images, queries,
+               search, thumbnails)
+from .models import Follow, Group, Post
+from .pagination import (CURSOR_PARAM, CursorPaginator, decode_cursor,
+                         page_redirect, paginate)
 
 User = get_user_model()
 
+COMMENTS_PER_PAGE = 20
 
+
+@condition(etag_func=conditional.index_etag)
 def index(request):
-    post_list = Post.objects.select_related('group')
-    paginator = Paginator(post_list, 10) 
-    page_number = request.GET.get('page') 
-    page = paginator.get_page(page_number) 
+    post_list = queries.index_feed()
+    moved = page_redirect(request, post_list)
+    if moved:
+        return moved
+    paginator, page = paginate(request, post_list)
     return render(
          request,
          'posts/index.html',
          {'page': page,
-          'paginator': paginator}
+          'paginator': paginator,
+          # Реплика может отставать от версии ленты в кеше: страница,
+          # собранная по старым данным, ляжет под старым ключом.
+          'feed_stamp': conditional.latest_update(request),
+          **caching.feed_cache_context(request, page)}
     ) 
 
 
+@condition(etag_func=conditional.group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts_list = group.posts.all()
-    paginator = Paginator(posts_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number) 
+    posts_list = queries.group_feed(group)
+    moved = page_redirect(request, posts_list)
+    if moved:
+        return moved
+    paginator, page = paginate(request, posts_list)
     return render(request, 'group.html', {'group': group,
                                          'page': page, 'paginator': paginator})
 
 
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    paginator = search.SearchPaginator(query)
+    page = paginator.page(request.GET.get(CURSOR_PARAM))
+    return render(
+        request,
+        'posts/search.html',
+        {'query': query,
+         'page': page,
+         'paginator': paginator,
+         'page_query': urlencode({'q': query})}
+    )
+
+
+@condition(etag_func=conditional.profile_etag)
 def profile(request, username): 
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    post_count = post_list.count()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    following = request.user.is_authenticated and request.user.follower.filter(
-        author=author).exists()
+    # Автора, счетчики и подписку уже прочитал ETag.
+    author, stats = conditional.page_author(request, username)
+    if author is None:
+        raise Http404
+    post_list = queries.profile_feed(author)
+    moved = page_redirect(request, post_list)
+    if moved:
+        return moved
+    paginator, page = paginate(request, post_list)
+    following = conditional.is_following(request, author)
     context = {
         'page': page,
         'author': author,
         'paginator': paginator,
-        'post_count': post_count,
-        'following': following
+        'stats': stats,
+        'post_count': stats.posts_count,
+        'following': following,
+        'recommendations': queries.who_to_follow(request.user),
     }
     return render(request, 'users/profile.html', context)
 
 
+@condition(etag_func=conditional.post_etag)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    count = post.author.posts.count()
-    comments = Comment.objects.filter(post_id=post_id)
+    post = get_object_or_404(queries.feed_posts(), id=post_id,
+                             author__username=username)
+    _, stats = conditional.page_author(request, username)
     form = CommentForm(request.POST or None)
     context = {
         'post': post, 
         'author': post.author, 
-        'count': count,
-        'comments': comments,
-        'form': form
+        'stats': stats,
+        'count': stats.posts_count,
+        'form': form,
+        **_comments(request, post_id),
     }
     return render(request, 'posts/post.html', context)
 
 
+def _comments(request, post_id):
+    """Порция комментариев после курсора и курсор следующей порции.
+
+    Порция остается QuerySet (так ее ждут шаблоны и тесты), а есть ли
+    продолжение, проверяет отдельный EXISTS по тому же индексу.
+    """
+    paginator = CursorPaginator(queries.post_comments(post_id),
+                                COMMENTS_PER_PAGE, queries.COMMENT_ORDERING)
+    token = request.GET.get(CURSOR_PARAM)
+    cursor = decode_cursor(token) if token else None
+    comments = paginator.after(cursor)[:COMMENTS_PER_PAGE]
+    rows = list(comments)
+    next_cursor = None
+    if len(rows) == COMMENTS_PER_PAGE:
+        last = rows[-1]
+        if paginator.after((last.created, last.pk)).exists():
+            next_cursor = paginator.cursor_for(last)
+    return {'comments': comments, 'comments_next': next_cursor}
+
+
+@condition(etag_func=conditional.comments_etag)
+def post_comments(request, username, post_id):
+    """Следующая порция комментариев для кнопки «Показать еще»."""
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             id=post_id, author__username=username)
+    return render(request, 'includes/comment_list.html', {
+        'post': post,
+        **_comments(request, post_id),
+    })
+
+
 @login_required
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, author__username=username, id=post_id)
@@ -83,7 +152,16 @@ def post_edit(request, username, post_id):
                 'is_edit': True,
             }
         )
-    post.save()
+    with transaction.atomic():
+        # Счетчики меняются параллельно через F(), их не перезаписываем.
+        post.save(update_fields=[
+            *PostForm.Meta.fields, *images.METADATA_FIELDS, 'updated'
+        ])
+        if 'image' in form.changed_data:
+            # Варианты прежней картинки: иначе карточка покажет ее srcset,
+            # пока воркер не построит новые.
+            images.delete_variants(post)
+            thumbnails.schedule(post)
     return redirect('post', username=post.author, post_id=post_id)
 
 
@@ -95,6 +173,8 @@ def new_post(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            thumbnails.schedule(post)
+            caching.remember_write(request)
 
             return redirect('index')
 
@@ -132,18 +212,21 @@ def add_comment(request, post_id, username):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.select_related('group').filter(
-        author__following__user=request.user
-    )
-    paginator = Paginator(post_list, 10) 
-    page_number = request.GET.get('page') 
-    page = paginator.get_page(page_number) 
+    entries = queries.follow_feed(request.user)
+    moved = page_redirect(request, entries,
+                          ordering=queries.TIMELINE_ORDERING)
+    if moved:
+        return moved
+    paginator, page = paginate(request, entries,
+                               ordering=queries.TIMELINE_ORDERING)
+    page.object_list = queries.posts_for(page)
 
     return render(
         request, 
         'posts/follow.html', 
         {'page': page,
-        'paginator': paginator}
+        'paginator': paginator,
+        'recommendations': queries.who_to_follow(request.user)}
     )
 
 
@@ -160,3 +243,19 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('profile', username=username)
+
+
+@login_required
+def export_data(request):
+    """Все посты и комментарии пользователя файлом, без загрузки в память."""
+    data_format = request.GET.get('format', 'jsonl')
+    kind = request.GET.get('kind', 'posts')
+    if data_format not in export.FORMATS or kind not in export.KINDS:
+        return HttpResponseBadRequest()
+    response = StreamingHttpResponse(
+        export.chunks(request.user, data_format, kind),
+        content_type=export.CONTENT_TYPES[data_format],
+    )
+    name = export.filename(request.user, data_format, kind)
+    response['Content-Disposition'] = f'attachment; filename="{name}"'
+    return response
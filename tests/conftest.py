@@ -1,4 +1,13 @@
+import pytest
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def inline_thumbnails(settings):
+    # Фоновый воркер миниатюр писал бы в базу параллельно с ее очисткой
+    # после теста; в тестах строим миниатюры прямо в запросе.
+    settings.THUMBNAIL_WORKERS = 0
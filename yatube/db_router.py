@@ -0,0 +1,107 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплики перечислены в ``DATABASE_REPLICAS`` (см. ``YATUBE_DB_REPLICAS`` в
+settings). С реплики читают только GET и HEAD запросы, которые пропустил
+``ReplicaRoutingMiddleware``. Все остальное идет в основную базу:
+запись, пользователи и сессии, команды, фоновые потоки.
+
+Реплика отстает от основной базы, поэтому после любой записи чтения
+запроса возвращаются на основную. Cookie ``primary_until`` держит там
+и чтения следующих запросов еще ``REPLICA_STICKY_SECONDS`` секунд:
+автор сразу видит свой пост и комментарий (read-your-writes).
+"""
+import contextvars
+import random
+import time
+
+from django.conf import settings
+
+PRIMARY = 'default'
+# Эти данные нужны свежими: вход, сессия, права.
+PRIMARY_APPS = {'auth', 'sessions', 'contenttypes', 'admin'}
+STICKY_COOKIE = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_current = contextvars.ContextVar('db_routing', default=None)
+
+
+class Routing:
+    """Маршрутизация одного запроса."""
+
+    def __init__(self, use_replicas):
+        replicas = list(getattr(settings, 'DATABASE_REPLICAS', ()))
+        # Одна реплика на весь запрос: у разных реплик разное отставание.
+        self.replica = (random.choice(replicas)
+                        if use_replicas and replicas else None)
+        self.wrote = False
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _current.get()
+        if (routing is None or routing.replica is None or routing.wrote
+                or model._meta.app_label in PRIMARY_APPS):
+            return PRIMARY
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _current.get()
+        if routing is not None:
+            routing.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии основной базы, связи между ними корректны.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему на реплики переносит sync_replica вместе с данными.
+        return db == PRIMARY
+
+
+def _sticky(request):
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _within(routing, chunks):
+    # Тело потокового ответа читается уже после выхода из middleware.
+    chunks = iter(chunks)
+    while True:
+        token = _current.set(routing)
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        finally:
+            _current.reset(token)
+        yield chunk
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routing = Routing(
+            request.method in SAFE_METHODS and not _sticky(request)
+        )
+        token = _current.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        if response.streaming:
+            response.streaming_content = _within(
+                routing, response.streaming_content
+            )
+        if routing.wrote:
+            until = time.time() + settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE, f'{until:.0f}',
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,180 @@
+"""Метрики запроса: SQL, рендер шаблонов, кеш и бюджеты по имени URL.
+
+``RequestMetricsMiddleware`` ставится первым в MIDDLEWARE. Он считает
+запросы к базе через ``execute_wrapper``, время рендера самых внешних
+шаблонов и попадания в кеш, а в конце отдает все в заголовке
+Server-Timing и одной строкой JSON в лог ``yatube.requests``. Запрос,
+вышедший за бюджет из ``PERFORMANCE_BUDGETS``, пишется с уровнем WARNING.
+
+Для потоковых ответов считается только работа до первого байта.
+"""
+import contextvars
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.db import connections
+from django.template.backends.django import Template
+
+logger = logging.getLogger('yatube.requests')
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+_MISSING = object()
+
+
+class Metrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def current():
+    """Метрики текущего запроса или None вне запроса."""
+    return _current.get()
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    begin = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - begin
+
+
+def _wrap_render(render):
+    def timed_render(self, *args, **kwargs):
+        metrics = _current.get()
+        if metrics is None:
+            return render(self, *args, **kwargs)
+        # Вложенные render_to_string (карточки постов) уже внутри
+        # внешнего шаблона: считаем только самый внешний.
+        metrics.template_depth += 1
+        begin = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - begin
+    timed_render.instrumented = True
+    return timed_render
+
+
+def _wrap_get(get):
+    def counted_get(self, key, default=None, version=None):
+        value = get(self, key, _MISSING, version)
+        metrics = _current.get()
+        if metrics is not None:
+            if value is _MISSING:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _MISSING else value
+    counted_get.instrumented = True
+    return counted_get
+
+
+def _wrap_get_many(get_many):
+    def counted_get_many(self, keys, version=None):
+        keys = list(keys)
+        found = get_many(self, keys, version)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+        return found
+    counted_get_many.instrumented = True
+    return counted_get_many
+
+
+def install():
+    """Оборачивает рендер шаблонов и чтения кешей; повторно не оборачивает."""
+    if not getattr(Template.render, 'instrumented', False):
+        Template.render = _wrap_render(Template.render)
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        if not getattr(backend.get, 'instrumented', False):
+            backend.get = _wrap_get(backend.get)
+        # BaseCache.get_many читает через get, эти ключи уже посчитаны.
+        if (backend.get_many is not BaseCache.get_many
+                and not getattr(backend.get_many, 'instrumented', False)):
+            backend.get_many = _wrap_get_many(backend.get_many)
+
+
+def budget_for(url_name):
+    budgets = getattr(settings, 'PERFORMANCE_BUDGETS', {})
+    return {**budgets.get('default', {}), **budgets.get(url_name, {})}
+
+
+def _url_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else None
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install()
+
+    def __call__(self, request):
+        metrics = Metrics()
+        token = _current.set(metrics)
+        begin = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - begin
+        self.report(request, response, metrics, total)
+        return response
+
+    def report(self, request, response, metrics, total):
+        url_name = _url_name(request)
+        budget = budget_for(url_name)
+        exceeded = []
+        if metrics.queries > budget.get('queries', float('inf')):
+            exceeded.append('queries')
+        if total * 1000 > budget.get('ms', float('inf')):
+            exceeded.append('ms')
+
+        if getattr(settings, 'SERVER_TIMING', True):
+            response['Server-Timing'] = ', '.join((
+                f'db;dur={metrics.db_time * 1000:.1f};'
+                f'desc="{metrics.queries} queries"',
+                f'tpl;dur={metrics.template_time * 1000:.1f}',
+                f'cache;desc="hits={metrics.cache_hits} '
+                f'misses={metrics.cache_misses}"',
+                f'total;dur={total * 1000:.1f}',
+            ))
+
+        line = json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'url_name': url_name,
+            'status': response.status_code,
+            'ms': round(total * 1000, 1),
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 1),
+            'template_ms': round(metrics.template_time * 1000, 1),
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+            'over_budget': exceeded,
+        }, ensure_ascii=False)
+        logger.log(logging.WARNING if exceeded else logging.INFO, line)
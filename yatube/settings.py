@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'about',
     'users',
     'posts',
+    'api',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -49,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.instrumentation.RequestMetricsMiddleware',
+    'yatube.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -90,6 +93,25 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: пути к копиям базы через запятую. Локально
+# копию обновляет команда sync_replica. Тесты запускаются без реплик,
+# маршрутизацию проверяет posts/tests/test_db_router.py.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+        filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{os.path.abspath(path)}?mode=ro',
+        'OPTIONS': {'uri': True},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['yatube.db_router.PrimaryReplicaRouter']
+
+# Сколько секунд после записи чтения пользователя идут в основную базу.
+REPLICA_STICKY_SECONDS = int(os.environ.get('YATUBE_REPLICA_STICKY', 10))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -144,8 +166,69 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
-CACHES = {
-    'default': {
+# locmem - свой кеш в каждом процессе, подходит для разработки и тестов;
+# sqlite - общий для всех воркеров файл, инвалидации видны всем сразу.
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-} 
\ No newline at end of file
+    },
+    'sqlite': {
+        'BACKEND': 'yatube.sqlite_cache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('YATUBE_CACHE_BACKEND', 'locmem')],
+}
+
+# Страницы ленты живут в кеше долго: их инвалидирует счетчик версии,
+# который увеличивается при любом изменении постов и комментариев.
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# Готовый HTML карточки поста; ключ меняется при правке и новых комментариях.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Потоки, в которых готовятся миниатюры; 0 - строить прямо в запросе.
+THUMBNAIL_WORKERS = int(os.environ.get('YATUBE_THUMBNAIL_WORKERS', 2))
+
+# Потоки для массовых действий модерации из админки; 0 - выполнять сразу
+# после коммита в том же запросе.
+MODERATION_WORKERS = int(os.environ.get('YATUBE_MODERATION_WORKERS', 1))
+
+# Метрики запроса в заголовке Server-Timing (см. yatube/instrumentation.py).
+SERVER_TIMING = True
+
+# Бюджеты на запрос по имени URL: число SQL-запросов и время в мс.
+# Превышение пишется в лог yatube.requests с уровнем WARNING, а
+# posts/tests/test_performance.py проверяет бюджеты на холодном кеше.
+PERFORMANCE_BUDGETS = {
+    'default': {'queries': 20, 'ms': 500},
+    'index': {'queries': 6},
+    'group': {'queries': 6},
+    'profile': {'queries': 12},
+    'post': {'queries': 10},
+    'follow_index': {'queries': 8},
+}
+
+# Строка JSON на каждый запрос пишется с уровнем INFO, превышение бюджета -
+# WARNING. По умолчанию видны только превышения.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'yatube.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('YATUBE_REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
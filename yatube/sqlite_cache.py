@@ -0,0 +1,249 @@
+"""Кеш в файле SQLite, общий для всех процессов на одной машине.
+
+В отличие от LocMemCache, данные и инвалидации видны всем воркерам сразу,
+внешних сервисов не нужно. Вытеснение приближенно LRU: время обращения
+обновляется не чаще раза в ``TOUCH_INTERVAL`` секунд, чтобы чтения не
+превращались в запись. Целые числа хранятся как INTEGER, поэтому
+``incr`` атомарен и не распаковывает значение.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+TOUCH_INTERVAL = 1.0
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+
+
+def _dump(value):
+    if type(value) is int:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _load(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _db(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _alive(self, expires, now):
+        return expires is None or expires > now
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        db = self._db
+        with _immediate(db):
+            row = db.execute(
+                'SELECT expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and self._alive(row[0], now):
+                return False
+            db.execute(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                (key, _dump(value), self.get_backend_timeout(timeout), now),
+            )
+        self._maybe_cull()
+        return True
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self._db.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,),
+        ).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        if not self._alive(expires, now):
+            self._db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, now),
+            )
+            return default
+        if now - accessed > TOUCH_INTERVAL:
+            self._db.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key)
+            )
+        return _load(value)
+
+    def get_many(self, keys, version=None):
+        made = {self._key(key, version): key for key in keys}
+        if not made:
+            return {}
+        now = time.time()
+        placeholders = ', '.join('?' * len(made))
+        rows = self._db.execute(
+            f'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({placeholders}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            (*made, now),
+        ).fetchall()
+        # Карточки ленты читаются только так: без отметки вытеснение шло
+        # бы по времени записи, а не по обращениям.
+        stale = [(now, key) for key, _, accessed in rows
+                 if now - accessed > TOUCH_INTERVAL]
+        if stale:
+            self._db.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', stale
+            )
+        return {made[key]: _load(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self._key(key, version), _dump(value), expires, now)
+            for key, value in data.items()
+        ]
+        db = self._db
+        with _immediate(db):
+            db.executemany(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)', rows
+            )
+        self._maybe_cull(len(rows))
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        stored = self._key(key, version)
+        now = time.time()
+        db = self._db
+        with _immediate(db):
+            cursor = db.execute(
+                "UPDATE cache SET value = value + ?, accessed = ? "
+                "WHERE key = ? AND typeof(value) = 'integer' "
+                "AND (expires IS NULL OR expires > ?)",
+                (delta, now, stored, now),
+            )
+            if cursor.rowcount:
+                return db.execute(
+                    'SELECT value FROM cache WHERE key = ?', (stored,)
+                ).fetchone()[0]
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (stored,)
+            ).fetchone()
+        if row is None or not self._alive(row[1], now):
+            raise ValueError("Key '%s' not found" % key)
+        # Не целое число: тот же путь, что и у BaseCache.incr, с ключом
+        # вызывающего - set сам добавит префикс и версию.
+        value = _load(row[0]) + delta
+        self.set(key, value, version=version)
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._db.executemany(
+                'DELETE FROM cache WHERE key = ?', [(key,) for key in keys]
+            )
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живет вместе с потоком: открывать файл на каждый
+        # запрос дороже, чем держать его.
+        pass
+
+    def _maybe_cull(self, writes=1):
+        self._writes += writes
+        if self._writes < max(self._cull_frequency, 1) * 10:
+            return
+        self._writes = 0
+        db = self._db
+        with _immediate(db):
+            db.execute(
+                'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+            )
+            count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            if count <= self._max_entries:
+                return
+            # Как и в остальных бэкендах Django: убираем 1/CULL_FREQUENCY
+            # записей, начиная с самых давно использованных.
+            excess = count - self._max_entries
+            victims = max(excess, count // max(self._cull_frequency, 1))
+            db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                ' SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (victims,),
+            )
+
+
+class _immediate:
+    """BEGIN IMMEDIATE ... COMMIT: берем блокировку записи сразу."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')